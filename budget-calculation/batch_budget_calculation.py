@@ -0,0 +1,224 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Calculates the budgets for a batch of Wildlife Corridor Design instances in parallel
+#
+# Given directories, glob patterns or files of .cor instances, this program runs the budget calculation for every
+# instance across a pool of worker processes, starting with the largest instance files so that the slowest instances
+# start early. A failing instance does not abort the batch. The results are written into a manifest (CSV or JSON)
+# that states, for each instance, the lower bound, the budgets, the wall time and the peak memory of the worker. On
+# Linux, the peak memory is the increase of the peak RSS of the worker over its RSS when it started the instance.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import csv
+import glob
+import json
+import os
+import time
+import traceback
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+from budget_calculation import calculate_lower_bound_for_budget, calculate_budget, get_output_file_name, \
+    create_new_cor_instances_with_budget_constants, get_lower_bound_cache_key, read_lower_bound_cache, \
+    write_lower_bound_cache, get_default_output_file
+from instance_reader import find_instance_files, is_instance_file_name
+from steiner_tree import STEINER_TREE_MODES
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design instance batch budget calculator")
+    parser.add_argument("instances", nargs="+",
+                        help="directories (searched recursively), glob patterns or .cor instance files, "
+                             "e.g. '../instances/artificial/*.cor.orig'")
+    parser.add_argument("-o", dest="output_pattern", required=False, default="",
+                        help="if given, the file name pattern for the .cor instances with budget constant, where "
+                             "{dir} is replaced by the directory of the instance, {name} by the instance file name "
+                             "without .cor extension and {percent} by the two-digit percentage, e.g. "
+                             "{dir}/{name}_{percent}b.cor", metavar="PATTERN")
+    parser.add_argument("-b", dest="budget_percents", required=False, default=[0.1], nargs="+", type=float,
+                        help="the percentage(s) to add to lower bound for budget, e.g. 0.1 for 10 percent")
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
+                        help="the seed for the steiner tree approximation algorithm")
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="calculate the exact minimal steiner tree or the approximation")
+    parser.add_argument("-c", dest="cache_file", required=False, default="",
+                        help="JSON file in which to cache the lower bounds for the budget", metavar="FILE")
+    parser.add_argument("-w", dest="workers", required=False, default=os.cpu_count(), type=int,
+                        help="the number of worker processes (default: number of CPUs)")
+    parser.add_argument("--manifest", dest="manifest_file", required=False, default="budget_manifest.csv",
+                        help="the manifest file to write, in JSON format if it ends with .json, otherwise CSV",
+                        metavar="FILE")
+    args = parser.parse_args()
+    if args.output_pattern != "" and len(args.budget_percents) > 1 and "{percent}" not in args.output_pattern:
+        parser.error("Several budget percentages require an output file pattern containing {percent}")
+    return args
+
+
+def collect_instance_files(instances: list) -> list:
+    """
+    Collects the instance files from the given directories, glob patterns and files, ordered by decreasing file size.
+    """
+    files = set()
+    for instance in instances:
+        if os.path.isdir(instance):
+            matching_files = find_instance_files(instance)
+        else:
+            matching_files = [path for path in glob.glob(instance, recursive=True)
+                              if os.path.isfile(path) and is_instance_file_name(path)]
+        if not matching_files:
+            print("Warning: no instance files found for: " + instance)
+        files.update(matching_files)
+    return sorted(files, key=lambda path: (-os.path.getsize(path), path))
+
+
+def get_instance_name(instance_file: str) -> str:
+    """ Returns the file name of the instance without directory and without the .cor extension and its suffixes """
+    return os.path.basename(get_default_output_file(instance_file, ""))
+
+
+def reset_peak_memory() -> bool:
+    """ Resets the peak RSS of the current process to its current RSS, which is only supported on Linux """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def read_memory_kb(field: str):
+    """
+    Returns the given memory field of the current process in KB, e.g. VmRSS for the current RSS or VmHWM for the peak
+    RSS since the last reset, or None if it is not available, which is only supported on Linux
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def get_peak_memory_kb(start_memory) -> int:
+    """
+    Returns the peak resident set size of the current process in KB, or None if it is not available.
+
+    :param start_memory: the RSS in KB when the peak RSS was reset with reset_peak_memory, or None; if given, the
+    increase of the peak RSS over it is returned, since a forked worker process starts with the memory (and with the
+    peak RSS) of the parent process; otherwise, the peak RSS of the whole process is returned
+    """
+    if start_memory is not None:
+        peak_memory = read_memory_kb("VmHWM")
+        return peak_memory - start_memory if peak_memory is not None else None
+    if resource is None:
+        return None
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_memory // 1024 if os.uname().sysname == "Darwin" else peak_memory  # macOS reports bytes
+
+
+def calculate_instance_budgets(task: tuple) -> dict:
+    """
+    Calculates the budgets for one instance and writes the .cor instances with budget constant, if an output pattern
+    is given. Runs in a worker process; any error is reported in the result instead of being raised.
+
+    :param task: the instance file, its cached lower bound (or None) and the batch settings
+    :return: the manifest entry of the instance
+    """
+    instance_file, lower_bound, budget_percents, seed, mode, output_pattern = task
+    result = {"instance": instance_file, "lower_bound": None, "budgets": {},
+              "wall_time": 0.0, "peak_memory_kb": None, "error": ""}
+    start_memory = read_memory_kb("VmRSS") if reset_peak_memory() else None
+    start_time = time.perf_counter()
+    try:
+        if lower_bound is None:
+            lower_bound = calculate_lower_bound_for_budget(instance_file, seed, mode)
+        result["lower_bound"] = lower_bound
+        outputs = []
+        for percentage in budget_percents:
+            budget = calculate_budget(lower_bound, percentage)
+            result["budgets"]["%02d" % round(percentage * 100)] = budget
+            if output_pattern != "":
+                output_file = output_pattern.replace("{dir}", os.path.dirname(instance_file) or ".") \
+                    .replace("{name}", get_instance_name(instance_file))
+                outputs.append((get_output_file_name(output_file, percentage), budget, percentage))
+        if outputs:
+            create_new_cor_instances_with_budget_constants(instance_file, outputs)
+    except Exception:
+        result["error"] = traceback.format_exc(limit=1).strip().splitlines()[-1]
+    result["wall_time"] = round(time.perf_counter() - start_time, 3)
+    result["peak_memory_kb"] = get_peak_memory_kb(start_memory)
+    return result
+
+
+def write_manifest(manifest_file: str, results: list, budget_percents: list) -> None:
+    """ Writes the results of the batch into the manifest file, as JSON or CSV depending on the file extension. """
+    results = sorted(results, key=lambda result: result["instance"])
+    if manifest_file.endswith(".json"):
+        with open(manifest_file, "w") as f:
+            json.dump(results, f, indent=1)
+        return
+    percent_columns = ["%02d" % round(percentage * 100) for percentage in budget_percents]
+    with open(manifest_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["instance", "lower_bound"] + ["budget_" + percent for percent in percent_columns] +
+                        ["wall_time", "peak_memory_kb", "error"])
+        for result in results:
+            writer.writerow([result["instance"], result["lower_bound"]] +
+                            [result["budgets"].get(percent) for percent in percent_columns] +
+                            [result["wall_time"], result["peak_memory_kb"], result["error"]])
+
+
+def run_batch(instance_files: list, budget_percents: list, seed: int, mode: str, output_pattern: str,
+              cache_file: str, workers: int) -> list:
+    """
+    Calculates the budgets of all given instance files in a pool of worker processes, where each worker process
+    handles one instance, so that its peak memory can be attributed to that instance.
+
+    :return: the manifest entries of all instances
+    """
+    cache = read_lower_bound_cache(cache_file)
+    cache_keys = {instance_file: get_lower_bound_cache_key(instance_file, seed, mode) if cache_file != "" else ""
+                  for instance_file in instance_files}
+    tasks = [(instance_file, cache.get(cache_keys[instance_file]), budget_percents, seed, mode, output_pattern)
+             for instance_file in instance_files]
+    results = []
+    with Pool(processes=max(1, workers), maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(calculate_instance_budgets, tasks):
+            status = "FAILED: " + result["error"] if result["error"] else "lower bound " + str(result["lower_bound"])
+            print(result["instance"] + ": " + status + " (" + str(result["wall_time"]) + "s)")
+            results.append(result)
+    if cache_file != "":
+        cache = read_lower_bound_cache(cache_file)
+        for result in results:
+            if result["lower_bound"] is not None:
+                cache[cache_keys[result["instance"]]] = result["lower_bound"]
+        write_lower_bound_cache(cache_file, cache)
+    return results
+
+
+def main():
+    args = parse_args()
+    instance_files = collect_instance_files(args.instances)
+    results = run_batch(instance_files, args.budget_percents, args.seed, args.mode, args.output_pattern,
+                        args.cache_file, args.workers)
+    write_manifest(args.manifest_file, results, args.budget_percents)
+    nb_failures = len([result for result in results if result["error"]])
+    print("Calculated budgets for " + str(len(results) - nb_failures) + " of " + str(len(results)) +
+          " instance(s), manifest: " + args.manifest_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Benchmarks the budget calculation on the instances in this repository
+#
+# For each instance, the benchmark runs the phases of the budget calculation, i.e. reading the instance, building the
+# graph, calculating a min-cost path between two reserves and calculating the Steiner tree, and records the wall time
+# and the peak resident set size (RSS) during each phase. The peak RSS of the process is reset before each phase
+# (through /proc/self/clear_refs, so it is only recorded on Linux). It also records the quality of the results:
+#
+#  - the gap between the Steiner tree cost and the optimal cost from the .minsteiner file next to the instance
+#  - the drift between the recalculated budget and the budget stated in the 'b' line of the instance, where the budget
+#    percentage is taken from the comment written by the budget calculation
+#
+# Each instance is benchmarked in a fresh process, one instance at a time, so that the peak RSS belongs to the instance
+# and the timings do not interfere. The results are written into a JSON baseline file. In compare mode, the results are
+# compared against a baseline file, and slower phases, higher memory usage and worse Steiner trees are flagged as
+# regressions.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import glob
+import json
+import os
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from multiprocessing import Pool
+
+from batch_budget_calculation import collect_instance_files, reset_peak_memory, read_memory_kb
+from budget_calculation import calculate_budget, read_budget_percentage
+from instance_reader import read_instance, create_graph_from_instance
+from min_cost_path_calculation import calculate_min_cost_path
+from multilevel_steiner_tree import multilevel_steiner_tree
+from steiner_tree import calculate_steiner_tree, STEINER_TREE_MODES
+
+BENCHMARK_MODES = STEINER_TREE_MODES + ["multilevel"]
+PHASES = ["read_instance", "graph_build", "min_cost_path", "steiner_tree"]
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design budget calculation benchmark")
+    parser.add_argument("instances", nargs="*",
+                        default=["../instances/grizzly/**/*.cor", "../instances/artificial/*.cor"],
+                        help="directories (searched recursively), glob patterns or instance files to benchmark; by "
+                             "default the Grizzly and artificial instances with budget")
+    parser.add_argument("-o", dest="output_file", required=False, default="benchmark_baseline.json",
+                        help="the JSON file into which to write the benchmark results", metavar="FILE")
+    parser.add_argument("--compare", dest="baseline_file", required=False, default="",
+                        help="compare the results against the given baseline file and flag regressions",
+                        metavar="FILE")
+    parser.add_argument("-r", dest="repetitions", required=False, default=3, type=int,
+                        help="the number of repetitions per instance; the fastest time of each phase is recorded")
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
+                        help="the seed for the steiner tree approximation algorithm")
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=BENCHMARK_MODES,
+                        help="calculate the exact minimal steiner tree, the approximation, or the multi-level "
+                             "approximation")
+    parser.add_argument("--time-tolerance", dest="time_tolerance", required=False, default=0.25, type=float,
+                        help="relative slowdown of a phase that is flagged as regression (default 0.25)")
+    parser.add_argument("--min-time", dest="min_time", required=False, default=0.01, type=float,
+                        help="absolute slowdown in seconds below which a phase is never flagged (default 0.01)")
+    parser.add_argument("--memory-tolerance", dest="memory_tolerance", required=False, default=0.25, type=float,
+                        help="relative increase of the peak RSS that is flagged as regression (default 0.25)")
+    args = parser.parse_args()
+    if args.baseline_file != "" and os.path.realpath(args.baseline_file) == os.path.realpath(args.output_file):
+        parser.error("The output file (-o) must not be the baseline file (--compare)")
+    return args
+
+
+def read_optimal_steiner_tree_cost(instance_file: str):
+    """ Returns the optimal Steiner tree cost from the .minsteiner file next to the instance, or None if there is none
+    """
+    minsteiner_files = glob.glob(os.path.join(os.path.dirname(instance_file), "*.minsteiner"))
+    if len(minsteiner_files) != 1:
+        return None
+    with open(minsteiner_files[0]) as f:
+        return int(f.readline().split()[0])
+
+
+def run_phase(phase: str, times: dict, peak_memory: dict, function: callable, *args):
+    """ Runs the given phase, records its wall time and its peak RSS, and returns the result of the phase """
+    reset = reset_peak_memory()
+    start_time = time.perf_counter()
+    result = function(*args)
+    times[phase] = time.perf_counter() - start_time
+    peak_memory[phase] = read_memory_kb("VmHWM") if reset else None
+    return result
+
+
+def run_phases(instance_file: str, seed: int, mode: str) -> tuple:
+    """
+    Runs all phases once for the given instance file.
+
+    :return: the wall time and the peak RSS during each phase, the instance, and the Steiner tree cost
+    """
+    times = {}
+    peak_memory = {}
+    instance = run_phase("read_instance", times, peak_memory, read_instance, instance_file)
+    run_phase("graph_build", times, peak_memory, create_graph_from_instance, instance)
+    reserves = instance.reserves()
+    run_phase("min_cost_path", times, peak_memory, calculate_min_cost_path, reserves[0], reserves[-1], instance)
+    if mode == "multilevel":
+        steiner_tree, steiner_tree_cost = run_phase("steiner_tree", times, peak_memory, multilevel_steiner_tree,
+                                                    instance, reserves, seed)
+    else:
+        steiner_tree, steiner_tree_cost = run_phase("steiner_tree", times, peak_memory, calculate_steiner_tree,
+                                                    instance, reserves, seed, mode)
+    return times, peak_memory, instance, steiner_tree_cost
+
+
+def benchmark_instance(task: tuple) -> dict:
+    """
+    Benchmarks the given instance file, running all phases repeatedly. Runs in a fresh worker process.
+
+    :param task: the instance file, the number of repetitions, the seed and the Steiner tree mode
+    :return: the benchmark result of the instance
+    """
+    instance_file, repetitions, seed, mode = task
+    result = {"instance": instance_file, "phases": {}, "steiner_tree_cost": None, "optimal_steiner_tree_cost": None,
+              "steiner_tree_gap": None, "budget": None, "file_budget": None, "budget_drift": None, "error": ""}
+    try:
+        for repetition in range(0, max(1, repetitions)):
+            times, peak_memory, instance, steiner_tree_cost = run_phases(instance_file, seed, mode)
+            for phase in PHASES:
+                previous = result["phases"].get(phase, {"time": float("inf"), "peak_rss_kb": None})
+                result["phases"][phase] = {"time": round(min(previous["time"], times[phase]), 6),
+                                           "peak_rss_kb": min((memory for memory in (previous["peak_rss_kb"],
+                                                                                     peak_memory[phase])
+                                                               if memory is not None), default=None)}
+        result["steiner_tree_cost"] = steiner_tree_cost
+        result["optimal_steiner_tree_cost"] = read_optimal_steiner_tree_cost(instance_file)
+        if result["optimal_steiner_tree_cost"]:
+            result["steiner_tree_gap"] = round(steiner_tree_cost / result["optimal_steiner_tree_cost"] - 1, 6)
+        percentage = read_budget_percentage(instance_file)
+        result["file_budget"] = instance.budget
+        if percentage is not None:
+            result["budget"] = calculate_budget(steiner_tree_cost, percentage)
+            if instance.budget is not None:
+                result["budget_drift"] = result["budget"] - instance.budget
+    except Exception as e:
+        result["error"] = type(e).__name__ + ": " + str(e)
+    return result
+
+
+def run_benchmark(instance_files: list, repetitions: int, seed: int, mode: str) -> dict:
+    """ Benchmarks all instance files, one at a time and each in a fresh process, and returns the results. """
+    results = {}
+    with Pool(processes=1, maxtasksperchild=1) as pool:
+        tasks = [(instance_file, repetitions, seed, mode) for instance_file in instance_files]
+        for result in pool.imap(benchmark_instance, tasks):
+            results[result["instance"]] = result
+            print_result(result)
+    return {"settings": {"repetitions": repetitions, "seed": seed, "mode": mode, "python": platform.python_version(),
+                         "machine": platform.machine()},
+            "results": results}
+
+
+def print_result(result: dict) -> None:
+    """ Prints a one-line summary of the benchmark result of an instance """
+    if result["error"]:
+        print(result["instance"] + ": FAILED: " + result["error"])
+        return
+    phases = " ".join(phase + "=" + "%.3fs" % result["phases"][phase]["time"] + "/" +
+                      str(result["phases"][phase]["peak_rss_kb"]) + "KB" for phase in PHASES)
+    print(result["instance"] + ": " + phases + " cost=" + str(result["steiner_tree_cost"]) + " gap=" +
+          str(result["steiner_tree_gap"]) + " budget_drift=" + str(result["budget_drift"]))
+
+
+def find_regressions(benchmark: dict, baseline: dict, time_tolerance: float, min_time: float,
+                     memory_tolerance: float) -> list:
+    """
+    Compares the benchmark results against the baseline results, instance by instance.
+
+    :return: a list of messages, one for each regression
+    """
+    regressions = []
+    for instance_file, result in sorted(benchmark["results"].items()):
+        baseline_result = baseline["results"].get(instance_file)
+        if baseline_result is None or baseline_result["error"]:
+            continue
+        if result["error"]:
+            regressions.append(instance_file + ": fails with " + result["error"])
+            continue
+        for phase in PHASES:
+            current = result["phases"][phase]
+            previous = baseline_result["phases"].get(phase)
+            if previous is None:
+                continue
+            if current["time"] > previous["time"] * (1 + time_tolerance) and \
+                    current["time"] - previous["time"] > min_time:
+                regressions.append(instance_file + ": " + phase + " takes %.3fs instead of %.3fs" %
+                                   (current["time"], previous["time"]))
+            if current["peak_rss_kb"] and previous["peak_rss_kb"] and \
+                    current["peak_rss_kb"] > previous["peak_rss_kb"] * (1 + memory_tolerance):
+                regressions.append(instance_file + ": peak RSS during " + phase + " is " +
+                                   str(current["peak_rss_kb"]) + "KB instead of " + str(previous["peak_rss_kb"]) +
+                                   "KB")
+        if result["steiner_tree_cost"] > baseline_result["steiner_tree_cost"]:
+            regressions.append(instance_file + ": Steiner tree cost is " + str(result["steiner_tree_cost"]) +
+                               " instead of " + str(baseline_result["steiner_tree_cost"]))
+    return regressions
+
+
+def main():
+    args = parse_args()
+    baseline = None
+    if args.baseline_file != "":
+        with open(args.baseline_file) as f:
+            baseline = json.load(f)
+    instance_files = collect_instance_files(args.instances)
+    benchmark = run_benchmark(instance_files, args.repetitions, args.seed, args.mode)
+    with open(args.output_file, "w") as f:
+        json.dump(benchmark, f, indent=1, sort_keys=True)
+    print("Wrote benchmark results: " + args.output_file)
+    if baseline is not None:
+        regressions = find_regressions(benchmark, baseline, args.time_tolerance, args.min_time,
+                                       args.memory_tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            sys.exit(1)
+        print("No regressions compared to baseline: " + args.baseline_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Converts Wildlife Corridor Design instances between the .cor text format and the compact binary format
+#
+# The binary format stores the node costs, profits, the reserve mask, the CSR adjacency and the budget as arrays that
+# are memory-mapped when loading (see instance_reader.load_binary_instance), which avoids parsing the text file every
+# time a tool reads the instance. The binary file also records the layout of the .cor file (comments, header and
+# budget lines, and any node lines that are not in the standard format), so that converting back restores the .cor
+# file byte by byte.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import json
+import os
+import struct
+import sys
+import tempfile
+from argparse import ArgumentParser
+from array import array
+
+from instance_reader import read_cor_file, is_binary_instance_file, format_node_line, read_cor_lines, \
+    find_instance_files, CorInstance, BINARY_INSTANCE_MAGIC, BINARY_INSTANCE_ARRAYS
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design instance converter between .cor and binary format")
+    parser.add_argument("-i", dest="input_file", required=False, default="",
+                        help="the instance file to convert; a .cor file is converted into the binary format, and a "
+                             "binary file back into the .cor format", metavar="FILE")
+    parser.add_argument("-o", dest="output_file", required=False, default="",
+                        help="the converted file; by default the .cor file name with extension .corb", metavar="FILE")
+    parser.add_argument("--check", dest="check_dir", required=False, default="",
+                        help="check that converting every .cor file in the given directory (recursively) to the "
+                             "binary format and back restores the .cor file byte by byte", metavar="DIR")
+    args = parser.parse_args()
+    if (args.input_file == "") == (args.check_dir == ""):
+        parser.error("Either an input file (-i) or a directory to check (--check) is required")
+    return args
+
+
+def get_cor_layout(cor_file: str, instance: CorInstance) -> list:
+    """
+    Determines the layout of the given .cor file: a list of segments, which are either ["text", lines] for lines that
+    are stored verbatim, or ["nodes", first node, last node + 1] for consecutive node lines in the standard format.
+
+    :param cor_file: the .cor file
+    :param instance: the instance read from the .cor file
+    :return: the layout of the .cor file
+    """
+    layout = []
+    with open(cor_file, newline="") as f:
+        for line in f:
+            node = None
+            if line.startswith("n"):
+                vals = line.split()
+                if len(vals) > 1 and vals[1].isdigit() and int(vals[1]) < instance.nb_nodes:
+                    node = int(vals[1])
+            if node is not None and line == format_node_line(instance, node):
+                if layout and layout[-1][0] == "nodes" and layout[-1][2] == node:
+                    layout[-1][2] = node + 1
+                else:
+                    layout.append(["nodes", node, node + 1])
+            elif layout and layout[-1][0] == "text":
+                layout[-1][1] = layout[-1][1] + line
+            else:
+                layout.append(["text", line])
+    return layout
+
+
+def write_binary_instance_file(instance: CorInstance, layout: list, binary_file: str) -> None:
+    """
+    Writes the given instance into the binary format.
+
+    :param instance: the instance
+    :param layout: the layout of the .cor file that the instance was read from, see get_cor_layout
+    :param binary_file: the binary file to write
+    """
+    typecodes = {"is_reserve": "b", "profit": "q", "cost": "q", "neighbour_offsets": "q",
+                 "neighbour_indices": "i" if instance.nb_nodes < 2 ** 31 else "q"}
+    arrays = [(name, array(typecodes[name], getattr(instance, name))) for name in BINARY_INSTANCE_ARRAYS]
+    header = {"nb_nodes": instance.nb_nodes, "nb_reserves": instance.nb_reserves, "budget": instance.budget,
+              "byteorder": sys.byteorder, "arrays": {}, "layout": layout}
+    # the array offsets depend on the header length, which depends on the offsets, so reserve enough digits
+    for name, values in arrays:
+        header["arrays"][name] = [values.typecode, 10 ** 15, len(values)]
+    header_length = len(json.dumps(header).encode("utf-8"))
+    offset = len(BINARY_INSTANCE_MAGIC) + 8 + header_length
+    for name, values in arrays:
+        offset = offset + (-offset) % 8
+        header["arrays"][name] = [values.typecode, offset, len(values)]
+        offset = offset + len(values) * values.itemsize
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_bytes = header_bytes + b" " * (header_length - len(header_bytes))
+    with open(binary_file, "wb") as f:
+        f.write(BINARY_INSTANCE_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, values in arrays:
+            f.write(b"\0" * (header["arrays"][name][1] - f.tell()))
+            values.tofile(f)
+
+
+def convert_cor_to_binary(cor_file: str, binary_file: str) -> None:
+    """ Converts the given .cor file into the binary format """
+    instance = read_cor_file(cor_file)
+    write_binary_instance_file(instance, get_cor_layout(cor_file, instance), binary_file)
+
+
+def convert_binary_to_cor(binary_file: str, cor_file: str) -> None:
+    """ Converts the given binary instance file back into the .cor format """
+    with open(cor_file, "w", newline="") as f:
+        for line in read_cor_lines(binary_file):
+            f.write(line)
+
+
+def check_round_trip(cor_file: str) -> bool:
+    """ Checks that converting the given .cor file into the binary format and back restores it byte by byte """
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        binary_file = os.path.join(temporary_dir, "instance.corb")
+        restored_file = os.path.join(temporary_dir, "instance.cor")
+        convert_cor_to_binary(cor_file, binary_file)
+        convert_binary_to_cor(binary_file, restored_file)
+        with open(cor_file, "rb") as original, open(restored_file, "rb") as restored:
+            return original.read() == restored.read()
+
+
+def get_default_binary_file(input_file: str) -> str:
+    """ Returns the .cor file name with extension .corb """
+    return input_file + "b" if input_file.endswith(".cor") else input_file + ".corb"
+
+
+def main():
+    args = parse_args()
+    if args.check_dir != "":
+        nb_failures = 0
+        for cor_file in find_instance_files(args.check_dir):
+            if is_binary_instance_file(cor_file):
+                continue
+            identical = check_round_trip(cor_file)
+            print(("OK      " if identical else "DIFFERS ") + cor_file)
+            nb_failures = nb_failures + (0 if identical else 1)
+        if nb_failures > 0:
+            print(str(nb_failures) + " instance(s) not restored byte by byte")
+            sys.exit(1)
+    elif is_binary_instance_file(args.input_file):
+        if args.output_file == "":
+            print("An output file (-o) is required to convert a binary instance file into a .cor file")
+            sys.exit(1)
+        convert_binary_to_cor(args.input_file, args.output_file)
+        print("Converted binary instance file into .cor file: " + args.output_file)
+    else:
+        output_file = args.output_file if args.output_file != "" else get_default_binary_file(args.input_file)
+        convert_cor_to_binary(args.input_file, output_file)
+        print("Converted .cor file into binary instance file: " + output_file)
+
+
+if __name__ == "__main__":
+    main()
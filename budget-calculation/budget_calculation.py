@@ -5,21 +5,31 @@
 # http://computational-sustainability.cis.cornell.edu/Datasets/corGenerator.zip
 # this program calculates the budget constant by:
 #
-# 1. Computing a minimum node-weighted Steiner Tree approximation for the instance
+# 1. Computing a minimum node-weighted Steiner Tree (or an approximation of it) for the instance
 # 2. Taking the Steiner tree cost, and increasing it by X%
 # 3. Extending the given .cor file with the budget constant, adding the line "b Y" where Y is the budget constant
 #
+# Several budget percentages can be given at once, in which case the Steiner tree is only computed once and all
+# resulting .cor files are written in one pass over the input file. The lower bounds can be cached in a file, keyed by
+# the content of the instance file, the seed and the Steiner tree mode.
+#
 # This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
 # See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
 #
 # Author: Andrea Rendl-Pitrey, Satalia, October 2020
 # ---------------------------------------------------------------------------------------------------------------------
 
+import hashlib
+import json
 import os
+import re
 from argparse import ArgumentParser
 
-from instance_reader import extract_info_from_cor_file, create_graph_from_adjacency_matrix
-from steiner_tree_approximation import approximate_steiner_tree
+import profiling
+from instance_reader import read_instance, read_cor_lines, is_binary_instance_file
+from steiner_tree import calculate_steiner_tree, STEINER_TREE_MODES
+
+BUDGET_PERCENTAGE_COMMENT = re.compile(r"^c the budget calculated from the minimum Steiner tree cost plus ([0-9.]+)%")
 
 
 def is_valid_file(parser, arg):
@@ -35,6 +45,17 @@ def is_valid_file(parser, arg):
         return arg
 
 
+def get_default_output_file(instance_file: str, extension: str) -> str:
+    """
+    Returns the instance file name with the .cor/.corb extension (and any suffix after it) replaced by the given
+    extension, e.g. my_instance.cor.orig with .dist3 by my_instance.dist3
+    """
+    base_name = instance_file
+    if ".cor" in os.path.basename(instance_file):
+        base_name = instance_file[:instance_file.rindex(".cor")]
+    return base_name + extension
+
+
 def parse_args():
     """
     Parsing the command line arguments
@@ -42,34 +63,67 @@ def parse_args():
     """
     parser = ArgumentParser(description="Wildlife corridor design instance budget calculator")
     parser.add_argument("-i", dest="instance_file", required=True,
-                        help=".cor instance file", metavar="FILE",
+                        help=".cor instance file (or binary instance file)", metavar="FILE",
                         type=lambda x: is_valid_file(parser, x))
     parser.add_argument("-o", dest="output_file", required=False, default="",
-                        help="the file into which to write the .cor instance with budget constant", metavar="FILE")
-    parser.add_argument("-b", dest="budget_percent", required=False, default=0.1,
-                        help="the percentage to add to lower bound for budget, e.g. 0.1 for 10 percent")
-    parser.add_argument("-s", dest="seed", required=False, default=11,
+                        help="the file into which to write the .cor instance with budget constant; for several "
+                             "budget percentages, a file name pattern where {percent} is replaced by the two-digit "
+                             "percentage, e.g. my_instance_{percent}b.cor", metavar="FILE")
+    parser.add_argument("-b", dest="budget_percents", required=False, default=[0.1], nargs="+", type=float,
+                        help="the percentage(s) to add to lower bound for budget, e.g. 0.1 for 10 percent")
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
                         help="the seed for the steiner tree approximation algorithm")
-    return parser.parse_args()
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="calculate the exact minimal steiner tree or the approximation; 'auto' (default) uses "
+                             "the exact calculation for instances with few reserves")
+    parser.add_argument("-c", dest="cache_file", required=False, default="",
+                        help="JSON file in which to cache the lower bounds for the budget", metavar="FILE")
+    parser.add_argument("-n", dest="starts", required=False, default=1, type=int,
+                        help="the number of starts of the steiner tree approximation; the first start is the "
+                             "deterministic greedy heuristic, the others are randomized by the seed (default 1)")
+    parser.add_argument("-w", dest="workers", required=False, default=os.cpu_count(), type=int,
+                        help="the number of worker processes for the starts (default: number of CPUs)")
+    parser.add_argument("--improve", dest="improve", required=False, action="store_true",
+                        help="improve the approximated steiner trees by local search")
+    parser.add_argument("--profile", dest="profile_file", required=False, default="",
+                        help="JSON file into which to write the phase timings and counters of the run", metavar="FILE")
+    parser.add_argument("--profile-hooks", dest="profile_hooks", required=False, default=[], nargs="+",
+                        choices=profiling.PROFILE_HOOKS,
+                        help="additionally capture the run with cProfile (written next to the profile file with "
+                             "extension .prof) and/or tracemalloc")
+    args = parser.parse_args()
+    if len(args.budget_percents) > 1 and "{percent}" not in args.output_file:
+        parser.error("Several budget percentages require an output file pattern containing {percent}")
+    if args.output_file == "" and is_binary_instance_file(args.instance_file):
+        parser.error("The budget cannot be appended to a binary instance file, please specify an output file")
+    if args.profile_hooks and args.profile_file == "":
+        parser.error("Profile hooks require a profile file (--profile)")
+    return args
 
 
-def calculate_lower_bound_for_budget(instance_file: str, seed: int) -> int:
+def calculate_lower_bound_for_budget(instance_file: str, seed: int, mode: str = "auto", starts: int = 1,
+                                     workers: int = 1, improve: bool = False) -> int:
     """
     Calculates a lower bound for the necessary budget to solve the Wildlife corridor design problem. This is done by
-    finding an approximation for the minimum node-weighted Steiner Tree where the reserves are the terminals of the
-    Steiner tree. The sum of all node costs of the nodes in the Steiner tree is a lower bound for the problem.
+    finding the minimum node-weighted Steiner Tree (or an approximation for it) where the reserves are the terminals
+    of the Steiner tree. The sum of all node costs of the nodes in the Steiner tree is a lower bound for the problem.
 
     :param instance_file: the .cor instance file that describes the graph and the reserves
     :param seed: the seed for the Steiner tree approximation algorithm.
+    :param mode: whether to calculate the exact Steiner tree ("exact"), the approximation ("approximate"), or to
+    choose based on the number of reserves ("auto")
+    :param starts: the number of starts of the Steiner tree approximation
+    :param workers: the number of worker processes that run the starts
+    :param improve: whether to improve the approximated Steiner trees by local search
     :return: the total node cost of the minimum node-weighted Steiner tree
     """
-    nb_nodes, nb_reserves, is_reserve, profit, cost, adjacency_matrix = extract_info_from_cor_file(instance_file)
-    graph = create_graph_from_adjacency_matrix(nb_nodes, adjacency_matrix, cost)
-    reserves = [] # extract the nodes that are reserves, which will be the terminals in the Steiner tree
-    for node in range(1, nb_nodes):
-        if is_reserve[node]:
-            reserves.append(node)
-    steiner_tree, steiner_tree_cost = approximate_steiner_tree(graph=graph, terminals=reserves, seed=seed)
+    with profiling.phase("read_instance"):
+        instance = read_instance(instance_file)
+    reserves = instance.reserves()  # the reserves will be the terminals in the Steiner tree
+    with profiling.phase("steiner_tree"):
+        steiner_tree, steiner_tree_cost = calculate_steiner_tree(graph=instance, terminals=reserves, seed=seed,
+                                                                 mode=mode, starts=starts, workers=workers,
+                                                                 improve=improve)
     return steiner_tree_cost
 
 
@@ -89,22 +143,118 @@ def append_budget_constant_to_instance_file(instance_file: str, budget: int, per
     f.close()
 
 
+def read_budget_percentage(instance_file: str):
+    """ Returns the budget percentage stated in the comments of the instance file, or None if there is none """
+    percentage = None
+    for line in read_cor_lines(instance_file):
+        match = BUDGET_PERCENTAGE_COMMENT.match(line)
+        if match:
+            percentage = float(match.group(1)) / 100
+    return percentage
+
+
 def create_new_cor_instance_with_budget_constant(input_file: str, output_file: str, budget: int, percentage: float):
-    new_instance_file = open(output_file, "w")
-    with open(input_file, "r") as f:
-        new_instance_file.write(f.read())
-    new_instance_file.close()
-    append_budget_constant_to_instance_file(output_file, budget, percentage)
+    create_new_cor_instances_with_budget_constants(input_file, [(output_file, budget, percentage)])
+
+
+def create_new_cor_instances_with_budget_constants(input_file: str, outputs: list) -> None:
+    """
+    Writes a copy of the input file with a budget constant for each of the given outputs, in one pass over the input.
+
+    :param input_file: the .cor instance file, or a binary instance file whose .cor file is restored
+    :param outputs: list of (output file, budget, percentage) triples
+    :return:
+    """
+    output_files = [open(output_file, "w", newline="") for output_file, budget, percentage in outputs]
+    try:
+        for line in read_cor_lines(input_file):
+            for output_file in output_files:
+                output_file.write(line)
+    finally:
+        for output_file in output_files:
+            output_file.close()
+    for output_file, budget, percentage in outputs:
+        append_budget_constant_to_instance_file(output_file, budget, percentage)
+
+
+def get_output_file_name(output_file_pattern: str, percentage: float) -> str:
+    """ Replaces {percent} in the output file pattern by the two-digit percentage, e.g. 0.05 by 05 """
+    return output_file_pattern.replace("{percent}", "%02d" % round(percentage * 100))
+
+
+def calculate_budget(lower_bound_for_budget: int, percentage: float) -> int:
+    """ Returns the budget that lies the given percentage above the lower bound. """
+    return round(lower_bound_for_budget + lower_bound_for_budget*float(percentage))
+
+
+def get_lower_bound_cache_key(instance_file: str, seed: int, mode: str, starts: int = 1, improve: bool = False) -> str:
+    """ Returns the cache key for the lower bound of the given instance, based on the content of the instance file. """
+    content_hash = hashlib.sha256()
+    with open(instance_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            content_hash.update(block)
+    key = content_hash.hexdigest() + ":" + str(seed) + ":" + mode
+    if starts != 1 or improve:  # keys of the single deterministic start stay as they were
+        key = key + ":" + str(starts) + (":improve" if improve else "")
+    return key
+
+
+def read_lower_bound_cache(cache_file: str) -> dict:
+    """ Reads the cached lower bounds from the given JSON file, if it exists. """
+    if cache_file == "" or not os.path.exists(cache_file):
+        return {}
+    with open(cache_file) as f:
+        return json.load(f)
+
+
+def write_lower_bound_cache(cache_file: str, cache: dict) -> None:
+    """ Writes the cached lower bounds into the given JSON file. """
+    temporary_file = cache_file + ".tmp"
+    with open(temporary_file, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(temporary_file, cache_file)
+
+
+def calculate_cached_lower_bound_for_budget(instance_file: str, seed: int, mode: str, cache_file: str, starts: int = 1,
+                                            workers: int = 1, improve: bool = False) -> int:
+    """
+    Returns the lower bound for the budget from the cache file, or calculates it and adds it to the cache file. Without
+    cache file (empty string), the lower bound is always calculated.
+    """
+    if cache_file == "":
+        return calculate_lower_bound_for_budget(instance_file, seed, mode, starts, workers, improve)
+    cache = read_lower_bound_cache(cache_file)
+    key = get_lower_bound_cache_key(instance_file, seed, mode, starts, improve)
+    if key in cache:
+        print("Using cached lower bound for the budget: " + str(cache[key]))
+        return cache[key]
+    lower_bound_for_budget = calculate_lower_bound_for_budget(instance_file, seed, mode, starts, workers, improve)
+    cache = read_lower_bound_cache(cache_file)  # re-read in case another process has extended the cache meanwhile
+    cache[key] = lower_bound_for_budget
+    write_lower_bound_cache(cache_file, cache)
+    return lower_bound_for_budget
 
 
 def main():
     args = parse_args()
-    lower_bound_for_budget = calculate_lower_bound_for_budget(args.instance_file, args.seed)
-    budget = round(lower_bound_for_budget + lower_bound_for_budget*float(args.budget_percent))
-    if args.output_file == "": # if no output file is specified, then extend input file
-        append_budget_constant_to_instance_file(args.instance_file, budget, args.budget_percent)
+    if args.profile_file != "":
+        profiling.start_profile(args.profile_hooks)
+    lower_bound_for_budget = calculate_cached_lower_bound_for_budget(args.instance_file, args.seed, args.mode,
+                                                                     args.cache_file, args.starts, args.workers,
+                                                                     args.improve)
+    if args.output_file == "":  # if no output file is specified, then extend input file
+        budget = calculate_budget(lower_bound_for_budget, args.budget_percents[0])
+        with profiling.phase("write_instances"):
+            append_budget_constant_to_instance_file(args.instance_file, budget, args.budget_percents[0])
     else:
-        create_new_cor_instance_with_budget_constant(args.instance_file, args.output_file, budget, args.budget_percent)
+        outputs = [(get_output_file_name(args.output_file, percentage),
+                    calculate_budget(lower_bound_for_budget, percentage), percentage)
+                   for percentage in args.budget_percents]
+        with profiling.phase("write_instances"):
+            create_new_cor_instances_with_budget_constants(args.instance_file, outputs)
+    if args.profile_file != "":
+        profiling.stop_profile().write(args.profile_file)
+        print("Wrote profile: " + args.profile_file)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,296 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Local service for budget, Steiner tree and path calculations on Wildlife Corridor Design instances
+#
+# The service listens on a Unix socket or a localhost TCP port and answers requests given as JSON objects, one per
+# line, with one JSON object per line:
+#
+#     {"id": 1, "method": "min_cost_path", "instance": "my_instance.cor", "source": 0, "target": 120}
+#     {"id": 1, "result": {"path": [0, 11, ..., 120], "cost": 42}}
+#
+# The methods are:
+#
+#  - "min_cost_path": the minimal node-cost path between "source" and "target"
+#  - "steiner_tree": the (approximate) minimal Steiner tree of the "terminals" (by default the reserves), with the
+#    optional "mode", "seed", "starts" and "improve" of the budget calculation
+#  - "budget": the lower bound and the budgets for the "percentages" (by default [0.1]), with the same options
+#  - "stats": the number of requests and the cached instances of each worker
+#
+# The calculations run in worker processes, each with its own cache of loaded instances, so that the service stays
+# responsive. Requests for the same instance always go to the same worker, so every instance is loaded only once and
+# later requests about it are answered from memory. Each worker evicts the least recently used instances when its
+# instances and their cached lower bounds exceed its share of the memory limit. The output of the calculations is
+# suppressed in the workers, so that it does not fill the service log.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import zlib
+from argparse import ArgumentParser
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from budget_calculation import calculate_budget
+from instance_reader import read_instance, CorInstance, BINARY_INSTANCE_ARRAYS
+from min_cost_path_calculation import calculate_min_cost_path
+from steiner_tree import calculate_steiner_tree
+
+SERVICE_METHODS = ["min_cost_path", "steiner_tree", "budget", "stats"]
+DEFAULT_MEMORY_LIMIT_MB = 1024
+
+worker_instance_cache = None  # the instance cache of a worker process
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design budget and path service")
+    parser.add_argument("--socket", dest="socket_path", required=False, default="",
+                        help="the Unix socket on which to listen", metavar="PATH")
+    parser.add_argument("--port", dest="port", required=False, default=0, type=int,
+                        help="the TCP port on localhost on which to listen")
+    parser.add_argument("-w", dest="workers", required=False, default=os.cpu_count(), type=int,
+                        help="the number of worker processes (default: number of CPUs)")
+    parser.add_argument("--memory-limit", dest="memory_limit_mb", required=False, default=DEFAULT_MEMORY_LIMIT_MB,
+                        type=int, help="the memory limit in MB for the cached instances and lower bounds of all "
+                                       "workers together (default %d)" % DEFAULT_MEMORY_LIMIT_MB)
+    args = parser.parse_args()
+    if (args.socket_path == "") == (args.port == 0):
+        parser.error("Either a Unix socket (--socket) or a TCP port (--port) is required")
+    return args
+
+
+def get_instance_size(instance: CorInstance) -> int:
+    """ Returns the number of bytes of the arrays of the given instance """
+    return sum(len(getattr(instance, name)) * getattr(instance, name).itemsize for name in BINARY_INSTANCE_ARRAYS)
+
+
+def get_lower_bound_size(key: tuple, lower_bound: tuple) -> int:
+    """ Returns the approximate number of bytes of a cached lower bound, 8 bytes per terminal and per tree node """
+    return 8 * (len(key[0]) + len(lower_bound[0]))
+
+
+class InstanceCache:
+    """
+    Least recently used cache of loaded instances, limited by the total size of their arrays and their cached lower
+    bounds. An instance is reloaded when its file has changed. The lower bounds calculated for an instance are cached
+    together with the instance and evicted with it.
+    """
+
+    def __init__(self, memory_limit: int):
+        """
+        :param memory_limit: the maximal total size of the cached instances and lower bounds in bytes
+        """
+        self.memory_limit = memory_limit
+        self.memory = 0
+        # [file version, instance, size, lower bounds] by instance file, least recently used first, where the size
+        # includes the lower bounds
+        self.entries = OrderedDict()
+        self.nb_loads = 0
+
+    def get(self, instance_file: str) -> (CorInstance, dict):
+        """ Returns the instance stated in the given file and its cached lower bounds, loading it if necessary """
+        instance_file = os.path.realpath(instance_file)
+        file_status = os.stat(instance_file)
+        version = (file_status.st_mtime_ns, file_status.st_size)
+        entry = self.entries.get(instance_file)
+        if entry is not None and entry[0] == version:
+            self.entries.move_to_end(instance_file)
+            return entry[1], entry[3]
+        if entry is not None:
+            self.remove(instance_file)
+        instance = read_instance(instance_file)
+        self.nb_loads = self.nb_loads + 1
+        size = get_instance_size(instance)
+        self.entries[instance_file] = [version, instance, size, {}]
+        self.memory = self.memory + size
+        self.evict()
+        return instance, self.entries[instance_file][3]
+
+    def add_lower_bound(self, instance_file: str, key: tuple, lower_bound: tuple) -> None:
+        """
+        Caches the given lower bound with the given instance, which must be in the cache. If the instance and its lower
+        bounds exceed the memory limit on their own, its oldest lower bounds are evicted.
+        """
+        entry = self.entries[os.path.realpath(instance_file)]
+        lower_bounds = entry[3]
+        lower_bounds[key] = lower_bound
+        size = get_lower_bound_size(key, lower_bound)
+        entry[2] = entry[2] + size
+        self.memory = self.memory + size
+        self.evict()
+        while entry[2] > self.memory_limit and len(lower_bounds) > 1:
+            oldest_key = next(iter(lower_bounds))
+            size = get_lower_bound_size(oldest_key, lower_bounds.pop(oldest_key))
+            entry[2] = entry[2] - size
+            self.memory = self.memory - size
+
+    def evict(self) -> None:
+        """ Removes the least recently used instances until the cache fits into the memory limit or one is left """
+        while self.memory > self.memory_limit and len(self.entries) > 1:
+            self.remove(next(iter(self.entries)))
+
+    def remove(self, instance_file: str) -> None:
+        """ Removes the given instance and its lower bounds from the cache """
+        self.memory = self.memory - self.entries.pop(instance_file)[2]
+
+    def stats(self) -> dict:
+        """ Returns the cached instances, their memory and the number of loads """
+        return {"instances": list(self.entries.keys()), "memory_mb": round(self.memory / 2 ** 20, 3),
+                "loads": self.nb_loads}
+
+
+def init_worker(memory_limit: int) -> None:
+    """ Initialises the instance cache of a worker process and suppresses the output of its calculations """
+    global worker_instance_cache
+    worker_instance_cache = InstanceCache(memory_limit)
+    sys.stdout = open(os.devnull, "w")
+
+
+def calculate_cached_steiner_tree(instance_file: str, instance: CorInstance, lower_bounds: dict,
+                                  request: dict) -> (array, int):
+    """ Returns the Steiner tree nodes and cost for the given request, from the lower bounds if possible """
+    terminals = request.get("terminals") or instance.reserves()
+    options = (request.get("seed", 11), request.get("mode", "auto"), request.get("starts", 1),
+               bool(request.get("improve", False)))
+    key = (tuple(terminals),) + options
+    if key not in lower_bounds:
+        steiner_tree, steiner_tree_cost = calculate_steiner_tree(instance, terminals, options[0], options[1],
+                                                                 starts=options[2], improve=options[3])
+        lower_bound = (array("q", sorted(steiner_tree.nodes())), steiner_tree_cost)
+        worker_instance_cache.add_lower_bound(instance_file, key, lower_bound)
+        return lower_bound
+    return lower_bounds[key]
+
+
+def handle_request(request: dict) -> dict:
+    """
+    Answers the given request in a worker process.
+
+    :param request: the request, see the description of the service
+    :return: the result of the request
+    """
+    if request["method"] == "stats":
+        return {"pid": os.getpid(), **worker_instance_cache.stats()}
+    instance, lower_bounds = worker_instance_cache.get(request["instance"])
+    if request["method"] == "min_cost_path":
+        path, cost = calculate_min_cost_path(request["source"], request["target"], instance)
+        return {"path": path, "cost": cost}
+    nodes, steiner_tree_cost = calculate_cached_steiner_tree(request["instance"], instance, lower_bounds, request)
+    if request["method"] == "steiner_tree":
+        return {"nodes": list(nodes), "cost": steiner_tree_cost}
+    if request["method"] == "budget":
+        return {"lower_bound": steiner_tree_cost,
+                "budgets": {"%02d" % round(percentage * 100): calculate_budget(steiner_tree_cost, percentage)
+                            for percentage in request.get("percentages", [0.1])}}
+
+
+class BudgetService:
+    """ The asyncio service that dispatches the requests to the worker processes """
+
+    def __init__(self, workers: int, memory_limit: int):
+        """
+        :param workers: the number of worker processes
+        :param memory_limit: the memory limit in bytes for the cached instances and lower bounds of all workers
+        """
+        self.executors = [ProcessPoolExecutor(max_workers=1, initializer=init_worker,
+                                              initargs=(memory_limit // max(1, workers),))
+                          for worker in range(0, max(1, workers))]
+        self.pending_futures = set()  # the requests submitted to the workers that are not answered yet
+        self.nb_requests = 0
+
+    def get_executor(self, instance_file: str) -> ProcessPoolExecutor:
+        """ Returns the worker for the given instance, which is always the same worker """
+        key = os.path.realpath(instance_file).encode("utf-8")
+        return self.executors[zlib.crc32(key) % len(self.executors)]
+
+    async def run_in_worker(self, executor: ProcessPoolExecutor, request: dict) -> dict:
+        """ Answers the given request by the given worker process """
+        future = executor.submit(handle_request, request)
+        self.pending_futures.add(future)
+        future.add_done_callback(self.pending_futures.discard)
+        return await asyncio.wrap_future(future)
+
+    async def answer(self, request: dict) -> dict:
+        """ Answers the given request by a worker process """
+        if request.get("method") not in SERVICE_METHODS:
+            raise ValueError("Unknown method: " + str(request.get("method")))
+        if request["method"] == "stats":
+            workers = await asyncio.gather(*(self.run_in_worker(executor, request) for executor in self.executors))
+            return {"requests": self.nb_requests, "workers": workers}
+        if not isinstance(request.get("instance"), str):
+            raise ValueError("The request has no instance file")
+        return await self.run_in_worker(self.get_executor(request["instance"]), request)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """ Answers the requests of one connection, one JSON object per line, in the order of the requests """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                self.nb_requests = self.nb_requests + 1
+                request = {}
+                try:
+                    request = json.loads(line)
+                    response = {"id": request.get("id"), "result": await self.answer(request)}
+                except Exception as e:
+                    response = {"id": request.get("id") if isinstance(request, dict) else None,
+                                "error": type(e).__name__ + ": " + str(e)}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def shutdown(self) -> None:
+        """ Stops the worker processes, cancelling the requests that have not started yet """
+        for future in list(self.pending_futures):
+            future.cancel()
+        for executor in self.executors:
+            executor.shutdown()
+
+
+async def serve(service: BudgetService, socket_path: str, port: int) -> None:
+    """ Serves the requests on the given Unix socket or localhost TCP port until interrupted or terminated """
+    if socket_path != "":
+        server = await asyncio.start_unix_server(service.handle_connection, path=socket_path)
+        print("Listening on Unix socket: " + socket_path)
+    else:
+        server = await asyncio.start_server(service.handle_connection, host="127.0.0.1", port=port)
+        print("Listening on localhost port: " + str(port))
+    stop = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal_number, stop.set)
+        except NotImplementedError:  # not available on Windows, where the service stops with KeyboardInterrupt
+            pass
+    async with server:
+        await stop.wait()
+    print("Stopped the service")
+
+
+def main():
+    args = parse_args()
+    service = BudgetService(args.workers, args.memory_limit_mb * 2 ** 20)
+    try:
+        asyncio.run(serve(service, args.socket_path, args.port))
+    except KeyboardInterrupt:
+        print("Stopped the service")
+    finally:
+        service.shutdown()
+        if args.socket_path != "" and os.path.exists(args.socket_path):
+            os.remove(args.socket_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Checks that the linear-time graph construction from the CSR neighbour lists yields the same graph as the original
+# construction from the adjacency matrix, for every .cor instance file in the given directory (recursively).
+#
+# Note that the original construction considers all pairs of nodes, so checking the 5x5 Grizzly instances takes a
+# while.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import sys
+from argparse import ArgumentParser
+
+import networkx as nx
+
+from instance_reader import read_instance, extract_info_from_cor_file, create_graph_from_adjacency_matrix, \
+    create_graph_from_instance, find_instance_files
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Compares the graph constructions for all .cor instances in a directory")
+    parser.add_argument("-d", dest="instance_dir", required=False, default="../instances",
+                        help="directory that is searched recursively for .cor instance files", metavar="DIR")
+    return parser.parse_args()
+
+
+def graphs_are_identical(graph: nx.Graph, reference_graph: nx.Graph) -> bool:
+    """
+    Checks if the graph is identical to the reference graph created with create_graph_from_adjacency_matrix. Since the
+    reference graph drops isolated nodes, the graph may only have additional nodes if they are isolated.
+    """
+    if {frozenset(edge) for edge in graph.edges()} != {frozenset(edge) for edge in reference_graph.edges()}:
+        return False
+    for node, cost in reference_graph.nodes(data="cost"):
+        if not graph.has_node(node) or graph.nodes[node]["cost"] != cost:
+            return False
+    return all(graph.degree(node) == 0 for node in graph.nodes() if not reference_graph.has_node(node))
+
+
+def check_instance(instance_file: str) -> bool:
+    """ Compares both graph constructions for the given instance file """
+    graph = create_graph_from_instance(read_instance(instance_file))
+    nb_nodes, nb_reserves, is_reserve, profit, cost, adjacency_matrix = extract_info_from_cor_file(instance_file)
+    reference_graph = create_graph_from_adjacency_matrix(nb_nodes, adjacency_matrix, cost)
+    return graphs_are_identical(graph, reference_graph) and graph.number_of_nodes() == nb_nodes
+
+
+def main():
+    args = parse_args()
+    nb_failures = 0
+    for instance_file in find_instance_files(args.instance_dir):
+        identical = check_instance(instance_file)
+        print(("OK      " if identical else "DIFFERS ") + instance_file)
+        if not identical:
+            nb_failures = nb_failures + 1
+    if nb_failures > 0:
+        print(str(nb_failures) + " instance(s) with differing graphs")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# What-if analysis of the budget for node cost changes
+#
+# Calculates the lower bound for the budget (the cost of the minimal Steiner tree of the reserves) and the budgets of
+# an instance under many cost scenarios, e.g. "the parcels in S get 20% more expensive", without writing a .cor file
+# and running the budget calculation for each scenario.
+#
+# A scenario is either a full cost vector with one cost per node, or a sparse cost change: a dict that maps the changed
+# nodes to the change of their cost. The scenarios share the neighbourhood arrays of the base instance, and the
+# Steiner tree of the base instance is calculated only once. A scenario only needs a new Steiner tree calculation if
+# it can change the tree:
+#
+#  - If no node of the base tree changes and no node gets cheaper, the base tree is still the cheapest tree, since
+#    every other tree costs at least as much as before. The lower bound is the base lower bound.
+#  - If only nodes of the base tree change and none of them gets more expensive, the base tree is still the cheapest
+#    tree, since no other tree gets cheaper by more than the base tree. The lower bound is the cost of the base tree
+#    with the new costs.
+#
+# Otherwise, the Steiner tree is calculated for the scenario costs. Scenarios with the same cost changes are only
+# calculated once. With the approximation, the base tree is kept in the first two cases as well.
+#
+# The scenario file states one scenario per line as a cost factor followed by the nodes whose costs are multiplied by
+# the factor, e.g. "1.2 17 18 19" for the nodes 17, 18 and 19 getting 20% more expensive. Empty lines and lines
+# starting with "#" are skipped.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import csv
+from argparse import ArgumentParser
+from array import array
+
+from budget_calculation import calculate_budget, is_valid_file
+from instance_reader import read_instance, CorInstance
+from steiner_tree import calculate_steiner_tree, STEINER_TREE_MODES
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design what-if budget analysis for cost scenarios")
+    parser.add_argument("-i", dest="instance_file", required=True,
+                        help=".cor instance file (or binary instance file)", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-f", dest="scenario_file", required=True,
+                        help="the scenario file, with one line 'factor node1 node2 ...' per scenario", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-o", dest="output_file", required=False, default="",
+                        help="the CSV file into which to write the lower bound and the budgets of each scenario",
+                        metavar="FILE")
+    parser.add_argument("-b", dest="budget_percents", required=False, default=[0.1], nargs="+", type=float,
+                        help="the budget percentages, e.g. 0.05 0.1 for 5 and 10 percent (default 0.1)")
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
+                        help="the seed for the steiner tree approximation algorithm")
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="calculate the exact minimal steiner tree or the approximation")
+    return parser.parse_args()
+
+
+def get_cost_changes(instance: CorInstance, scenario) -> dict:
+    """
+    Returns the cost changes of the given scenario.
+
+    :param instance: the base instance
+    :param scenario: a full cost vector with one cost per node, or a dict that maps nodes to the change of their cost
+    :return: a dict that maps the nodes whose cost changes to the change of their cost
+    """
+    if isinstance(scenario, dict):
+        for node in scenario:
+            if not 0 <= node < instance.nb_nodes:
+                raise ValueError("The scenario changes the cost of the unknown node " + str(node))
+        return {node: change for node, change in scenario.items() if change != 0}
+    if len(scenario) != instance.nb_nodes:
+        raise ValueError("The scenario has " + str(len(scenario)) + " costs, but the instance has " +
+                         str(instance.nb_nodes) + " nodes")
+    return {node: scenario[node] - instance.cost[node] for node in range(0, instance.nb_nodes)
+            if scenario[node] != instance.cost[node]}
+
+
+def get_scaled_cost_changes(instance: CorInstance, nodes: list, factor: float) -> dict:
+    """ Returns the cost changes of multiplying the costs of the given nodes by the factor, rounded to integers """
+    return {node: round(instance.cost[node] * factor) - instance.cost[node] for node in nodes}
+
+
+def create_scenario_instance(instance: CorInstance, cost_changes: dict) -> CorInstance:
+    """ Returns the instance with the changed costs, which shares all other arrays with the given instance """
+    cost = array("q", instance.cost)
+    for node, change in cost_changes.items():
+        cost[node] = cost[node] + change
+        if cost[node] < 0:
+            raise ValueError("The scenario gives node " + str(node) + " the negative cost " + str(cost[node]))
+    return instance._replace(cost=cost)
+
+
+def calculate_scenario_lower_bounds(instance: CorInstance, scenarios: list, seed: int, mode: str = "auto",
+                                    budget_percents: list = ()) -> (array, list):
+    """
+    Calculates the lower bound for the budget and the budgets of the instance for each cost scenario, recalculating
+    the Steiner tree only for the scenarios that can change the Steiner tree of the base instance.
+
+    :param instance: the base instance
+    :param scenarios: the scenarios, each a full cost vector or a dict that maps nodes to the change of their cost
+    :param seed: the seed for the Steiner tree approximation
+    :param mode: the Steiner tree calculation, see calculate_steiner_tree
+    :param budget_percents: the budget percentages
+    :return: the lower bound of each scenario, and for each budget percentage the budget of each scenario
+    """
+    reserves = instance.reserves()
+    base_tree, base_tree_cost = calculate_steiner_tree(instance, reserves, seed, mode)
+    in_base_tree = bytearray(instance.nb_nodes)
+    for node in base_tree.nodes():
+        in_base_tree[node] = 1
+    lower_bounds = array("q")
+    calculated_lower_bounds = {}
+    nb_calculations = 0
+    for scenario in scenarios:
+        cost_changes = get_cost_changes(instance, scenario)
+        tree_changes = [change for node, change in cost_changes.items() if in_base_tree[node]]
+        if len(tree_changes) == 0 and all(change > 0 for change in cost_changes.values()):
+            lower_bound = base_tree_cost
+        elif len(tree_changes) == len(cost_changes) and all(change < 0 for change in tree_changes):
+            lower_bound = base_tree_cost + sum(tree_changes)
+        else:
+            key = tuple(sorted(cost_changes.items()))
+            if key not in calculated_lower_bounds:
+                scenario_tree, calculated_lower_bounds[key] = calculate_steiner_tree(
+                    create_scenario_instance(instance, cost_changes), reserves, seed, mode)
+                nb_calculations = nb_calculations + 1
+            lower_bound = calculated_lower_bounds[key]
+        lower_bounds.append(lower_bound)
+    print("Calculated the steiner tree for " + str(nb_calculations) + " of " + str(len(scenarios)) + " scenarios")
+    budgets = [array("q", (calculate_budget(lower_bound, percentage) for lower_bound in lower_bounds))
+               for percentage in budget_percents]
+    return lower_bounds, budgets
+
+
+def read_scenario_file(scenario_file: str, instance: CorInstance) -> list:
+    """
+    Reads the scenarios of the given file, with one line 'factor node1 node2 ...' per scenario.
+
+    :return: the cost changes of each scenario
+    """
+    scenarios = []
+    with open(scenario_file) as f:
+        for line in f:
+            values = line.split()
+            if len(values) == 0 or values[0].startswith("#"):
+                continue
+            scenarios.append(get_scaled_cost_changes(instance, [int(node) for node in values[1:]], float(values[0])))
+    return scenarios
+
+
+def write_scenario_results(output_file: str, lower_bounds: array, budgets: list, budget_percents: list) -> None:
+    """ Writes the lower bound and the budgets of each scenario into the given CSV file """
+    with open(output_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["scenario", "lower_bound"] +
+                        ["budget_%02d" % round(percentage * 100) for percentage in budget_percents])
+        for scenario in range(0, len(lower_bounds)):
+            writer.writerow([scenario, lower_bounds[scenario]] +
+                            [percentage_budgets[scenario] for percentage_budgets in budgets])
+
+
+def main():
+    args = parse_args()
+    instance = read_instance(args.instance_file)
+    scenarios = read_scenario_file(args.scenario_file, instance)
+    lower_bounds, budgets = calculate_scenario_lower_bounds(instance, scenarios, args.seed, args.mode,
+                                                            args.budget_percents)
+    if args.output_file != "":
+        write_scenario_results(args.output_file, lower_bounds, budgets, args.budget_percents)
+        print("Wrote the lower bounds and budgets of " + str(len(scenarios)) + " scenarios: " + args.output_file)
+    else:
+        for scenario in range(0, len(lower_bounds)):
+            print("Scenario " + str(scenario) + ": lower bound " + str(lower_bounds[scenario]) + ", budgets " +
+                  " ".join(str(percentage_budgets[scenario]) for percentage_budgets in budgets))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Disjoint-set (union-find) data structure over the node ids 0..n-1 of a graph, with union by size and path halving.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+from array import array
+
+
+class DisjointSet:
+    """ Partition of the nodes 0..nb_nodes-1 into disjoint sets, where initially every node is in its own set. """
+
+    def __init__(self, nb_nodes: int):
+        self.parent = array("q", range(0, nb_nodes))
+        self.size = array("q", [1]) * nb_nodes
+
+    def find(self, node: int) -> int:
+        """ Returns the representative (root) of the set that contains the given node. """
+        parent = self.parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def union(self, node1: int, node2: int) -> int:
+        """ Joins the sets that contain the two given nodes and returns the representative of the joined set. """
+        root1 = self.find(node1)
+        root2 = self.find(node2)
+        if root1 == root2:
+            return root1
+        if self.size[root1] < self.size[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.size[root1] = self.size[root1] + self.size[root2]
+        return root1
+
+    def connected(self, node1: int, node2: int) -> bool:
+        """ Checks if the two given nodes are in the same set. """
+        return self.find(node1) == self.find(node2)
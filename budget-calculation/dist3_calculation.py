@@ -0,0 +1,113 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Calculates the .dist3 pruning file for a Wildlife Corridor Design instance
+#
+# For each node v that is not a reserve, the .dist3 file states the cost of the cheapest connected set of nodes that
+# contains v and all reserves, i.e. the cost of the minimal node-weighted Steiner tree for the reserves and v. If the
+# budget is smaller than this cost, then v cannot be part of a solution for this budget. The file has one line per
+# non-reserve node with the node id followed by its cost.
+#
+# The costs are calculated for all nodes at once with the Dreyfus-Wagner dynamic program from exact_steiner_tree:
+# the table entry for the set of all reserves and node v is exactly the cost of the tree that connects all reserves
+# and v. For 3 reserves, this takes 3 single-source searches and 4 multi-source searches.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import sys
+from argparse import ArgumentParser
+from array import array
+
+from budget_calculation import is_valid_file, get_default_output_file
+from exact_steiner_tree import calculate_steiner_tree_tables
+from instance_reader import read_instance, CorInstance
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design instance .dist3 calculator")
+    parser.add_argument("-i", dest="instance_file", required=True,
+                        help=".cor instance file (or binary instance file)", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-o", dest="output_file", required=False, default="",
+                        help="the .dist3 file to write", metavar="FILE")
+    parser.add_argument("-c", dest="check_file", required=False, default=None,
+                        help="the existing .dist3 file to check against the calculated costs", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    return parser.parse_args()
+
+
+def calculate_dist3(instance: CorInstance) -> array:
+    """
+    Calculates, for every node, the cost of the minimal node-weighted Steiner tree that connects all reserves and the
+    node (infinity if the node is not connected to the reserves).
+
+    :param instance: the instance
+    :return: the cost for each node
+    """
+    reserves = instance.reserves()
+    tree_cost, predecessor, best_partition = calculate_steiner_tree_tables(instance.nb_nodes, instance.neighbours,
+                                                                           instance.cost, reserves)
+    return tree_cost[(1 << len(reserves)) - 1]
+
+
+def write_dist3_file(dist3_file: str, instance: CorInstance, dist3: array) -> None:
+    """ Writes the costs of all non-reserve nodes that are connected to the reserves into the given .dist3 file. """
+    with open(dist3_file, "w") as f:
+        for node in range(0, instance.nb_nodes):
+            if not instance.is_reserve[node] and dist3[node] < float("inf"):
+                f.write(str(node) + " " + str(int(dist3[node])) + "\n")
+    print("Wrote .dist3 file: " + str(dist3_file))
+
+
+def read_dist3_file(dist3_file: str) -> dict:
+    """ Reads the given .dist3 file and returns the cost of each listed node. """
+    dist3 = {}
+    with open(dist3_file) as f:
+        for line in f:
+            vals = line.split()
+            if len(vals) == 2:
+                dist3[int(vals[0])] = int(vals[1])
+    return dist3
+
+
+def check_dist3_file(dist3_file: str, instance: CorInstance, dist3: array) -> list:
+    """
+    Checks the given .dist3 file against the calculated costs.
+
+    :return: the list of (node, cost in file, calculated cost) for all nodes where the file differs, where a missing
+    cost is None
+    """
+    file_dist3 = read_dist3_file(dist3_file)
+    differences = []
+    for node in range(0, instance.nb_nodes):
+        expected = None if instance.is_reserve[node] or dist3[node] == float("inf") else int(dist3[node])
+        if file_dist3.get(node) != expected:
+            differences.append((node, file_dist3.get(node), expected))
+    return differences
+
+
+def main():
+    args = parse_args()
+    instance = read_instance(args.instance_file)
+    dist3 = calculate_dist3(instance)
+    if args.check_file is not None:
+        differences = check_dist3_file(args.check_file, instance, dist3)
+        for node, file_cost, expected in differences[:10]:
+            print("node " + str(node) + ": " + str(file_cost) + " in file, but calculated " + str(expected))
+        if differences:
+            print(str(len(differences)) + " differences found in .dist3 file: " + str(args.check_file))
+            sys.exit(1)
+        print("The .dist3 file is correct: " + str(args.check_file))
+    else:
+        output_file = args.output_file
+        if output_file == "":
+            output_file = get_default_output_file(args.instance_file, ".dist3")
+        write_dist3_file(output_file, instance, dist3)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Exact node-weighted Minimal Steiner Tree for small numbers of terminals
+#
+# ------ Algorithm: -----------------------------------------------------------------
+#
+# The algorithm is the dynamic program by Dreyfus and Wagner, adapted to node weights:
+# "The Steiner problem in graphs", Dreyfus, S. E., and Wagner, R. A. (1971), Networks 1,
+# pages 195-207.
+#
+# Given an undirected graph G=(V,E) with costs c_v associated with each vertex v in V,
+# and a set of terminal vertices Vt subset V. Pick a root terminal r and let
+# Vt' = Vt \ {r}. For each subset S of Vt' and each vertex v, let D(S, v) be the cost of
+# the cheapest tree that connects S and v (including the cost of v and of the terminals).
+#
+# 1. For each terminal t in Vt', D({t}, v) is given by a node-weighted search from t.
+# 2. For each subset S of Vt' with |S| > 1, in the order of increasing size:
+#    a. Merge: for each vertex v, the cheapest way to join two trees for a partition
+#       S1, S2 of S in v, i.e. min D(S1, v) + D(S2, v) - c_v
+#    b. Grow: extend the merged trees along node-weighted paths with one multi-source
+#       search that starts from all vertices with their merged cost.
+# 3. The minimal Steiner tree costs D(Vt', r).
+#
+# The running time is O(3^k n + 2^k (n + m) log n) for k terminals. For 3 terminals, this
+# amounts to two single-source searches, one scan for the best centre vertex over all
+# vertices, and one multi-source search.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+from array import array
+
+import networkx as nx
+
+import profiling
+from disjoint_set import DisjointSet
+from min_cost_path_calculation import get_search_structure, node_weighted_dijkstra
+from steiner_tree_approximation import create_steiner_tree_graph
+
+
+def merge_subtrees(subset: int, tree_cost: list, cost, nb_nodes: int) -> (array, array):
+    """
+    Calculates the cheapest way to join two trees for a partition of the given subset of terminals in each vertex.
+
+    :param subset: bit mask of the subset of terminals
+    :param tree_cost: the cost D(S, v) of the cheapest tree connecting S and v, for all proper subsets S of subset
+    :param cost: the node costs, indexed by node
+    :param nb_nodes: upper bound on the node ids
+    :return: the merged costs for each vertex, and the bit mask of the first subset of the best partition
+    """
+    merged_cost = array("d", [float("inf")]) * nb_nodes
+    best_partition = array("q", [0]) * nb_nodes
+    lowest_terminal = subset & -subset
+    partition = (subset - 1) & subset
+    while partition > 0:
+        if partition & lowest_terminal:  # consider each partition only once
+            cost1 = tree_cost[partition]
+            cost2 = tree_cost[subset ^ partition]
+            for node in range(0, nb_nodes):
+                node_cost = cost1[node] + cost2[node] - cost[node]
+                if node_cost < merged_cost[node]:
+                    merged_cost[node] = node_cost
+                    best_partition[node] = partition
+        partition = (partition - 1) & subset
+    return merged_cost, best_partition
+
+
+def collect_steiner_tree(subset: int, root: int, predecessor: list, best_partition: list) -> (list, list):
+    """
+    Collects the nodes and edges of the cheapest tree that connects the given subset of terminals and the root from the
+    dynamic programming tables. Subtrees may share nodes, so only the edges that join different subtrees are kept.
+
+    :return: the nodes and edges of the tree
+    """
+    nodes = {root}
+    edges = []
+    components = DisjointSet(len(predecessor[subset]))
+    stack = [(subset, root)]
+    while stack:
+        subset, node = stack.pop()
+        nodes.add(node)
+        previous_node = predecessor[subset][node]
+        if previous_node >= 0:
+            if not components.connected(previous_node, node):
+                components.union(previous_node, node)
+                edges.append((previous_node, node))
+            stack.append((subset, previous_node))
+        elif subset & (subset - 1):  # the tree is joined from two subtrees in this node
+            partition = best_partition[subset][node]
+            stack.append((partition, node))
+            stack.append((subset ^ partition, node))
+    return sorted(nodes), edges
+
+
+def calculate_steiner_tree_tables(nb_nodes: int, neighbours: callable, cost, terminals: list) -> (list, list, list):
+    """
+    Calculates the dynamic programming tables for the given terminals: for each subset S of the terminals (as bit
+    mask) and each node v, the cost D(S, v) of the cheapest tree that connects S and v, and how this tree is composed.
+
+    :param nb_nodes: upper bound on the node ids
+    :param neighbours: function that returns the neighbours of a given node
+    :param cost: the node costs, indexed by node
+    :param terminals: the terminals, where terminal i corresponds to bit i of the subset masks
+    :return: the tree costs, the predecessors of the nodes in the grown trees, and the best partitions of the merged
+    trees, each indexed by subset (None for the empty subset)
+    """
+    full_subset = (1 << len(terminals)) - 1
+    if profiling.active_profile is not None:
+        profiling.active_profile.count("terminal_subsets", full_subset)
+    tree_cost = [None] * (full_subset + 1)
+    predecessor = [None] * (full_subset + 1)
+    best_partition = [None] * (full_subset + 1)
+    for i in range(0, len(terminals)):
+        terminal = terminals[i]
+        distance, predecessor[1 << i] = node_weighted_dijkstra(nb_nodes, neighbours, cost, [terminal])
+        tree_cost[1 << i] = array("d", (node_distance + cost[terminal] for node_distance in distance))
+    for subset in range(1, full_subset + 1):  # every proper subset of a subset is smaller than the subset
+        if subset & (subset - 1) == 0:
+            continue  # single terminal
+        with profiling.phase("subtree_merge"):
+            merged_cost, best_partition[subset] = merge_subtrees(subset, tree_cost, cost, nb_nodes)
+        sources = [node for node in range(0, nb_nodes) if merged_cost[node] < float("inf")]
+        tree_cost[subset], predecessor[subset] = node_weighted_dijkstra(
+            nb_nodes, neighbours, cost, sources, source_distances=[merged_cost[node] for node in sources])
+    return tree_cost, predecessor, best_partition
+
+
+def exact_steiner_tree(graph, terminals: list) -> (nx.Graph, int):
+    """
+    Returns a node-weighted minimal Steiner tree using the Dreyfus-Wagner dynamic program, which is exponential in the
+    number of terminals and therefore only suitable for a small number of terminals.
+
+    :param graph: the underlying graph with weighted nodes with "cost" label, or a CorInstance
+    :param terminals: the terminals of the Steiner tree, which must be nodes in the given graph
+    :return: the graph representing the Steiner tree and its node cost
+    """
+    nb_nodes, neighbours, cost = get_search_structure(graph)
+    terminals = list(dict.fromkeys(terminals))
+    root = terminals[-1]
+    other_terminals = terminals[:-1]
+    full_subset = (1 << len(other_terminals)) - 1
+    if full_subset > 0:
+        tree_cost, predecessor, best_partition = calculate_steiner_tree_tables(nb_nodes, neighbours, cost,
+                                                                               other_terminals)
+        if tree_cost[full_subset][root] == float("inf"):
+            raise nx.NetworkXNoPath("The terminals are not connected.")
+        nodes, edges = collect_steiner_tree(full_subset, root, predecessor, best_partition)
+    else:
+        nodes, edges = [root], []
+    steiner_tree, steiner_tree_cost = create_steiner_tree_graph(nodes, edges, cost)
+    print("Calculated minimal node-weighted steiner tree with cost: " + str(steiner_tree_cost))
+    return steiner_tree, steiner_tree_cost
@@ -0,0 +1,164 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Generates synthetic grid instances of the Wildlife Corridor Design problem
+#
+# Generates an N x M grid of parcels in the .cor format, where every parcel is connected to its 4 (or 8) neighbouring
+# parcels, R randomly chosen parcels are reserves, and the costs and utilities are random integers in [0, l], similar
+# to the lattice instances of the corGenerator (http://computational-sustainability.cis.cornell.edu/Datasets/
+# corGenerator.zip):
+#
+#  - uncorrelated ("uncorr"): the utility is independent of the cost
+#  - correlated ("corr"): the utility deviates from the cost by at most d/2
+#
+# Reserves have cost 0. The instance is determined by the seed. The node lines are written to the file row by row as
+# they are generated, so the memory usage does not depend on the size of the grid, which allows generating instances
+# with millions of parcels. Optionally, the budget calculation is run on the generated instance to write instances
+# with budget constants.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import os
+import random
+from argparse import ArgumentParser
+
+from budget_calculation import calculate_lower_bound_for_budget, create_new_cor_instances_with_budget_constants, \
+    calculate_budget
+from steiner_tree import STEINER_TREE_MODES
+
+UTILITY_MODELS = ["corr", "uncorr"]
+NEIGHBOURHOODS = [4, 8]
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design grid instance generator")
+    parser.add_argument("-n", dest="rows", required=True, type=int, help="the number of rows of the grid")
+    parser.add_argument("-m", dest="columns", required=False, default=0, type=int,
+                        help="the number of columns of the grid (default: the number of rows)")
+    parser.add_argument("-r", dest="nb_reserves", required=False, default=3, type=int,
+                        help="the number of reserves (default 3)")
+    parser.add_argument("-u", dest="utility_model", required=False, default="corr", choices=UTILITY_MODELS,
+                        help="whether the utilities are correlated with the costs (default corr)")
+    parser.add_argument("-k", dest="neighbourhood", required=False, default=4, type=int, choices=NEIGHBOURHOODS,
+                        help="the number of neighbours of a parcel inside the grid (default 4)")
+    parser.add_argument("-l", dest="max_value", required=False, default=100, type=int,
+                        help="the maximal cost and utility of a parcel (default 100)")
+    parser.add_argument("-d", dest="deviation", required=False, default=70, type=int,
+                        help="the maximal deviation between utility and cost for correlated utilities (default 70)")
+    parser.add_argument("-s", dest="seed", required=False, default=1, type=int, help="the seed (default 1)")
+    parser.add_argument("-o", dest="output_dir", required=False, default=".",
+                        help="the directory into which to write the instances", metavar="DIR")
+    parser.add_argument("-b", dest="budget_percents", required=False, default=[], nargs="+", type=float,
+                        help="if given, also write instances with budget constants for these percentages, e.g. 0.05 "
+                             "0.1 for 5 and 10 percent")
+    parser.add_argument("--steiner-mode", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="the Steiner tree calculation for the budget (default auto)")
+    args = parser.parse_args()
+    args.columns = args.columns if args.columns > 0 else args.rows
+    if not 0 < args.nb_reserves <= args.rows * args.columns:
+        parser.error("The number of reserves must be between 1 and the number of parcels")
+    return args
+
+
+def get_instance_name(nb_nodes: int, nb_reserves: int, utility_model: str, percentage: float = None) -> str:
+    """ Returns the instance name in the style of the artificial instances, e.g. 121P_3R_05b_corr """
+    budget = "" if percentage is None else "%02db_" % round(percentage * 100)
+    return str(nb_nodes) + "P_" + str(nb_reserves) + "R_" + budget + utility_model
+
+
+def get_grid_neighbours(node: int, rows: int, columns: int, neighbourhood: int) -> list:
+    """ Returns the neighbours of the given node in the grid, in ascending order """
+    row, column = divmod(node, columns)
+    neighbours = []
+    for row_offset in (-1, 0, 1):
+        for column_offset in (-1, 0, 1):
+            if (row_offset == 0 and column_offset == 0) or \
+                    (neighbourhood == 4 and row_offset != 0 and column_offset != 0):
+                continue
+            if 0 <= row + row_offset < rows and 0 <= column + column_offset < columns:
+                neighbours.append(node + row_offset * columns + column_offset)
+    return neighbours
+
+
+def write_grid_instance(instance_file: str, rows: int, columns: int, nb_reserves: int, utility_model: str,
+                        neighbourhood: int, max_value: int, deviation: int, seed: int) -> None:
+    """
+    Writes a random grid instance in .cor format, row by row.
+
+    :param instance_file: the .cor file to write
+    :param rows: the number of rows of the grid
+    :param columns: the number of columns of the grid
+    :param nb_reserves: the number of reserves
+    :param utility_model: "corr" for utilities correlated with the costs, "uncorr" for independent utilities
+    :param neighbourhood: 4 or 8, the number of neighbours of a parcel inside the grid
+    :param max_value: the maximal cost and utility of a parcel
+    :param deviation: the maximal deviation between utility and cost for correlated utilities
+    :param seed: the seed
+    """
+    nb_nodes = rows * columns
+    rng = random.Random(seed)
+    reserves = sorted(rng.sample(range(0, nb_nodes), nb_reserves))
+    next_reserve = 0
+    with open(instance_file, "w") as f:
+        f.write("c generated by instance_generator.py: " + str(rows) + "x" + str(columns) + " grid, " +
+                str(neighbourhood) + "-neighbourhood\n")
+        f.write("c Seed = " + str(seed) + "\n")
+        f.write("c \n"
+                "c Corridor instance\n"
+                "c Format:\n"
+                "c p n r\n"
+                "c   n is the number of parcels, n is  an integer;\n"
+                "c   r is the number of reserves, n is  an integer;\n"
+                "c n i b u c e i1 i2 ...  ie\n"
+                "c   i is the id number of the node, i is an integer; \n"
+                "c   b whether the node is a reserve; b is 0 or 1; \n"
+                "c   u is the utility of the node; u is an integer; \n"
+                "c   c is the cost of the node; c is an integer; \n"
+                "c   e is the number of neighboring nodes; e is an integer; \n"
+                "c   ij is the id of neighbor node j (j=1,2, ... ,e) \n"
+                "c \n")
+        f.write("c n = " + str(nb_nodes) + "\nc r = " + str(nb_reserves) + "\nc l = " + str(max_value) +
+                "\nc d = " + str(deviation) + "\nc terminalmodel = random\nc utilmodel = " + utility_model + "\n")
+        f.writelines("c reserve " + str(reserve) + "\n" for reserve in reserves)
+        f.write("c \np " + str(nb_nodes) + " " + str(nb_reserves) + "\n")
+        for row in range(0, rows):
+            lines = []
+            for node in range(row * columns, (row + 1) * columns):
+                is_reserve = next_reserve < nb_reserves and reserves[next_reserve] == node
+                next_reserve = next_reserve + (1 if is_reserve else 0)
+                cost = rng.randint(0, max_value)
+                if utility_model == "corr":
+                    utility = min(max_value, max(0, cost + rng.randint(-(deviation // 2), deviation // 2)))
+                else:
+                    utility = rng.randint(0, max_value)
+                neighbours = get_grid_neighbours(node, rows, columns, neighbourhood)
+                lines.append("n " + str(node) + " " + ("1 " if is_reserve else "0 ") + str(utility) + " " +
+                             ("0" if is_reserve else str(cost)) + " " + str(len(neighbours)) + " " +
+                             " ".join(map(str, neighbours)) + "\n")
+            f.writelines(lines)
+
+
+def main():
+    args = parse_args()
+    nb_nodes = args.rows * args.columns
+    os.makedirs(args.output_dir, exist_ok=True)
+    instance_file = os.path.join(args.output_dir,
+                                 get_instance_name(nb_nodes, args.nb_reserves, args.utility_model) + ".cor.orig")
+    write_grid_instance(instance_file, args.rows, args.columns, args.nb_reserves, args.utility_model,
+                        args.neighbourhood, args.max_value, args.deviation, args.seed)
+    print("Wrote instance with " + str(nb_nodes) + " parcels: " + instance_file)
+    if args.budget_percents:
+        lower_bound_for_budget = calculate_lower_bound_for_budget(instance_file, args.seed, args.mode)
+        outputs = [(os.path.join(args.output_dir, get_instance_name(nb_nodes, args.nb_reserves, args.utility_model,
+                                                                    percentage) + ".cor"),
+                    calculate_budget(lower_bound_for_budget, percentage), percentage)
+                   for percentage in args.budget_percents]
+        create_new_cor_instances_with_budget_constants(instance_file, outputs)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,41 +5,85 @@
 # This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
 # See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
 #
+# Instances can also be stored in a compact binary format (.corb) that is memory-mapped when loading, see
+# load_binary_instance. The functions read_instance and read_cor_lines accept both formats.
+#
 # Author: Andrea Rendl-Pitrey, Satalia, October 2020
 # ---------------------------------------------------------------------------------------------------------------------
 
+import fnmatch
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import NamedTuple, Optional
+
 import networkx as nx
 
 
-def extract_info_from_cor_file(file_name: str) -> (int, int, list, list, list, list):
+class CorInstance(NamedTuple):
+    """
+    Compact, array-backed representation of a .cor instance. The neighbourhood of each node is stored in
+    compressed sparse row (CSR) format: the neighbours of node i are
+    neighbour_indices[neighbour_offsets[i]:neighbour_offsets[i + 1]], in the order in which they are listed in the file.
+    Instances loaded from the binary format hold read-only memoryviews of the memory-mapped file instead of arrays.
+    """
+    nb_nodes: int
+    nb_reserves: int
+    is_reserve: array  # 0-1 entry per node
+    profit: array
+    cost: array
+    neighbour_offsets: array  # nb_nodes + 1 entries
+    neighbour_indices: array
+    budget: Optional[int] = None  # the budget constant of the 'b' line, if the file has one
+
+    def neighbours(self, node: int) -> array:
+        """ Returns the neighbours of the given node. """
+        return self.neighbour_indices[self.neighbour_offsets[node]:self.neighbour_offsets[node + 1]]
+
+    def reserves(self) -> list:
+        """ Returns the (ascending) list of nodes that are reserves. """
+        return [node for node in range(0, self.nb_nodes) if self.is_reserve[node]]
+
+
+def read_cor_file(file_name: str) -> CorInstance:
     """
-    Extracts all relevant information from the given .cor instance file
+    Reads the given .cor instance file line by line into a compact CorInstance, without ever building a dense
+    adjacency matrix. Memory usage is linear in the number of nodes and edges of the instance.
+
     :param file_name: the name (and path to) the .cor file
-    :return: the instance information stated in the file
+    :return: the instance stated in the file
     """
+    nb_nodes = 0
+    nb_reserves = 0
+    budget = None
+    is_reserve = array("b")
+    profit = array("q")
+    cost = array("q")
+    degree = array("q")
+    file_position = array("q")  # start of the neighbours of each node in file_order_indices
+    file_order_indices = array("q")  # neighbours of all nodes, in the order of the node lines in the file
+    in_id_order = True  # whether the node lines are sorted by id, which is the case for all generated instances
+    previous_id = -1
+
     with open(file_name) as f:
-        lines = f.readlines()
-        nb_nodes = 0
-        nb_reserves = 0
-        is_reserve = []
-        profit = []
-        cost = []
-        adjacency_matrix = []
-
-        for line in lines:
+        for line in f:
             if line.startswith("c"):
                 continue  # ignore comments
             if line.startswith("p"):
                 vals = line.split()
                 nb_nodes = int(vals[1])
                 nb_reserves = int(vals[2])
-                is_reserve = [-1] * nb_nodes
-                profit = [-1] * nb_nodes
-                cost = [-1] * nb_nodes
-                adjacency_matrix = [[]] * nb_nodes
+                is_reserve = array("b", [-1]) * nb_nodes
+                profit = array("q", [-1]) * nb_nodes
+                cost = array("q", [-1]) * nb_nodes
+                degree = array("q", [0]) * nb_nodes
+                file_position = array("q", [0]) * nb_nodes
             # parse node information
-            if line.startswith("n"):
-                adjacency = [0] * nb_nodes
+            elif line.startswith("n"):
                 # the line consists of the following entries:
                 # n id reserve? utility cost #neighbouring-nodes i1 i2 ...  ie
                 vals = line.split()
@@ -48,12 +92,167 @@ def extract_info_from_cor_file(file_name: str) -> (int, int, list, list, list, l
                 profit[id] = int(vals[3])
                 cost[id] = int(vals[4])
                 nb_neighbours = int(vals[5])
-                for i in range(6, 6 + nb_neighbours):
-                    neighbour = int(vals[i])
-                    adjacency[neighbour] = 1
-                adjacency_matrix[id] = adjacency
+                degree[id] = nb_neighbours
+                file_position[id] = len(file_order_indices)
+                file_order_indices.extend(map(int, vals[6:6 + nb_neighbours]))
+                in_id_order = in_id_order and id == previous_id + 1
+                previous_id = id
+            elif line.startswith("b"):
+                budget = int(line.split()[1])
+
+    neighbour_offsets = array("q", [0]) * (nb_nodes + 1)
+    for node in range(0, nb_nodes):
+        neighbour_offsets[node + 1] = neighbour_offsets[node] + degree[node]
+    if in_id_order and previous_id == nb_nodes - 1:
+        neighbour_indices = file_order_indices
+    else:  # sort the neighbour lists by node id
+        neighbour_indices = array("q")
+        for node in range(0, nb_nodes):
+            neighbour_indices.extend(file_order_indices[file_position[node]:file_position[node] + degree[node]])
+    return CorInstance(nb_nodes, nb_reserves, is_reserve, profit, cost, neighbour_offsets, neighbour_indices, budget)
+
+
+# The binary instance format consists of the magic bytes, the length of the JSON header as unsigned 64-bit little-endian
+# integer, the JSON header, and the arrays of the instance, each starting at a multiple of 8 bytes. The header states
+# the instance sizes, the budget, the type, offset and length of each array, the byte order of the arrays, and the
+# layout of the .cor file the instance was converted from, so that the .cor file can be restored byte by byte.
+BINARY_INSTANCE_MAGIC = b"CORBIN01"
+BINARY_INSTANCE_ARRAYS = ["is_reserve", "profit", "cost", "neighbour_offsets", "neighbour_indices"]
+
+
+def is_binary_instance_file(file_name: str) -> bool:
+    """ Checks if the given file is an instance in the binary format """
+    with open(file_name, "rb") as f:
+        return f.read(len(BINARY_INSTANCE_MAGIC)) == BINARY_INSTANCE_MAGIC
+
 
-    return nb_nodes, nb_reserves, is_reserve, profit, cost, adjacency_matrix
+def read_binary_instance_header(file_name: str) -> dict:
+    """ Reads the JSON header of the given binary instance file """
+    with open(file_name, "rb") as f:
+        if f.read(len(BINARY_INSTANCE_MAGIC)) != BINARY_INSTANCE_MAGIC:
+            raise ValueError("Not a binary instance file: " + str(file_name))
+        header_length = struct.unpack("<Q", f.read(8))[0]
+        return json.loads(f.read(header_length).decode("utf-8"))
+
+
+def load_binary_instance(file_name: str) -> CorInstance:
+    """
+    Loads the given binary instance file by memory-mapping it, so that the arrays of the instance are not copied, but
+    read from the file on demand.
+
+    :param file_name: the name (and path to) the binary instance file
+    :return: the instance, whose arrays are read-only memoryviews
+    """
+    header = read_binary_instance_header(file_name)
+    with open(file_name, "rb") as f:
+        mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapped_file)
+    arrays = {}
+    for name in BINARY_INSTANCE_ARRAYS:
+        typecode, offset, length = header["arrays"][name]
+        values = buffer[offset:offset + length * array(typecode).itemsize].cast(typecode)
+        if header["byteorder"] != sys.byteorder and values.itemsize > 1:  # fall back to a byte-swapped copy
+            values = array(typecode, values.tobytes())
+            values.byteswap()
+        arrays[name] = values
+    return CorInstance(header["nb_nodes"], header["nb_reserves"], arrays["is_reserve"], arrays["profit"],
+                       arrays["cost"], arrays["neighbour_offsets"], arrays["neighbour_indices"], header["budget"])
+
+
+def copy_instance_arrays(instance: CorInstance) -> CorInstance:
+    """
+    Returns the instance with arrays instead of the memoryviews of a binary instance, which cannot be pickled, e.g. to
+    pass the instance to worker processes.
+    """
+    return instance._replace(**{name: array(getattr(instance, name).format, getattr(instance, name))
+                                for name in BINARY_INSTANCE_ARRAYS if isinstance(getattr(instance, name), memoryview)})
+
+
+def read_instance(file_name: str) -> CorInstance:
+    """ Reads the given instance file, which is either a .cor file or a binary instance file. """
+    if is_binary_instance_file(file_name):
+        return load_binary_instance(file_name)
+    return read_cor_file(file_name)
+
+
+def format_node_line(instance: CorInstance, node: int) -> str:
+    """ Returns the 'n' line that describes the given node in a .cor file """
+    return "n " + " ".join(map(str, [node, instance.is_reserve[node], instance.profit[node], instance.cost[node],
+                                     instance.neighbour_offsets[node + 1] - instance.neighbour_offsets[node]] +
+                                    list(instance.neighbours(node)))) + "\n"
+
+
+def read_cor_lines(file_name: str):
+    """
+    Yields the lines of the given instance file in .cor format. For a binary instance file, the lines of the .cor file
+    it was converted from are restored.
+    """
+    if not is_binary_instance_file(file_name):
+        with open(file_name, newline="") as f:
+            yield from f
+        return
+    instance = load_binary_instance(file_name)
+    for segment in read_binary_instance_header(file_name)["layout"]:
+        if segment[0] == "text":
+            yield segment[1]
+        else:  # a range of node lines
+            for node in range(segment[1], segment[2]):
+                yield format_node_line(instance, node)
+
+
+INSTANCE_FILE_PATTERNS = ["*.cor", "*.cor.orig", "*.cor.original", "*.corb"]
+
+
+def is_instance_file_name(file_name: str) -> bool:
+    """ Checks if the given file name has the extension of an instance file, see find_instance_files """
+    return any(fnmatch.fnmatch(os.path.basename(file_name), pattern) for pattern in INSTANCE_FILE_PATTERNS)
+
+
+def find_instance_files(instance_dir: str) -> list:
+    """
+    Returns all instance files in the given directory tree: .cor files, the original files without budget, and binary
+    instance files (.corb).
+    """
+    files = set()
+    for pattern in INSTANCE_FILE_PATTERNS:
+        files.update(glob.glob(os.path.join(instance_dir, "**", pattern), recursive=True))
+    return sorted(files)
+
+
+class SparseAdjacencyRow:
+    """
+    Read-only 0-1 row of an adjacency matrix that only stores the neighbours of the node. Supports the indexing and
+    iteration of the dense rows returned by earlier versions of extract_info_from_cor_file.
+    """
+
+    def __init__(self, nb_nodes: int, neighbours: array):
+        self.nb_nodes = nb_nodes
+        self.neighbours = frozenset(neighbours)
+
+    def __len__(self) -> int:
+        return self.nb_nodes
+
+    def __getitem__(self, node: int) -> int:
+        return 1 if node in self.neighbours else 0
+
+    def __iter__(self):
+        return (1 if node in self.neighbours else 0 for node in range(0, self.nb_nodes))
+
+
+def extract_info_from_cor_file(file_name: str) -> (int, int, list, list, list, list):
+    """
+    Extracts all relevant information from the given .cor (or binary) instance file. Adapter for read_instance that
+    returns the instance as tuple, where the rows of the adjacency matrix are sparse rows that can be indexed like
+    dense 0-1 lists.
+
+    :param file_name: the name (and path to) the .cor file
+    :return: the instance information stated in the file
+    """
+    instance = read_instance(file_name)
+    adjacency_matrix = [SparseAdjacencyRow(instance.nb_nodes, instance.neighbours(node))
+                        for node in range(0, instance.nb_nodes)]
+    return instance.nb_nodes, instance.nb_reserves, list(instance.is_reserve), list(instance.profit), \
+        list(instance.cost), adjacency_matrix
 
 
 def create_graph_from_adjacency_matrix(nb_nodes: int, adjacency_matrix: list, cost: list) -> nx.Graph:
@@ -74,4 +273,30 @@ def create_graph_from_adjacency_matrix(nb_nodes: int, adjacency_matrix: list, co
                 if not graph.has_node(target):
                     graph.add_node(target, cost=cost[target])
                 graph.add_edge(source, target)
-    return graph
\ No newline at end of file
+    return graph
+
+
+def create_graph_from_csr(nb_nodes: int, neighbour_offsets: array, neighbour_indices: array, cost: array) -> nx.Graph:
+    """
+    Creates the undirected graph given by the CSR neighbour lists and the costs on the nodes in O(V+E). In contrast to
+    create_graph_from_adjacency_matrix, every node is added to the graph, including isolated nodes.
+
+    :param nb_nodes: number of nodes in the graph
+    :param neighbour_offsets: the neighbours of node i start at neighbour_offsets[i] in neighbour_indices
+    :param neighbour_indices: the concatenated neighbour lists of all nodes
+    :param cost: list of length nb_nodes that contains the cost of each node
+    :return: the graph with a 'cost' label on every node
+    """
+    graph = nx.Graph()
+    graph.add_nodes_from((node, {"cost": cost[node]}) for node in range(0, nb_nodes))
+    graph.add_edges_from((source, target)
+                         for source in range(0, nb_nodes)
+                         for target in neighbour_indices[neighbour_offsets[source]:neighbour_offsets[source + 1]]
+                         if source < target)
+    return graph
+
+
+def create_graph_from_instance(instance: CorInstance) -> nx.Graph:
+    """ Creates the undirected graph with node costs of the given instance, see create_graph_from_csr. """
+    return create_graph_from_csr(instance.nb_nodes, instance.neighbour_offsets, instance.neighbour_indices,
+                                 instance.cost)
@@ -0,0 +1,269 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Budget-aware reduction of Wildlife Corridor Design instances
+#
+# Removes the nodes that cannot be part of any corridor within the budget and writes the remaining instance as a
+# smaller, renumbered .cor file, together with a mapping file that states the original id of every node. The
+# reduction removes:
+#
+# 1. unavailable nodes, i.e. nodes that cost more than the budget on their own, or, if an unavailability threshold is
+#    given, nodes whose cost is at least the threshold (the Grizzly instances mark unavailable cells with cost 9999999,
+#    or 999999 in the 5x5 instance). Without budget and threshold, no node is unavailable, since an expensive node may
+#    still be needed to connect the reserves.
+# 2. nodes whose .dist3 value exceeds the budget of the 'b' line: a corridor that contains the node connects the node
+#    and all reserves, so its cost is at least the cost of the minimal Steiner tree of the reserves and the node
+# 3. nodes that are not connected to the reserves any more
+# 4. optionally, non-reserve nodes of degree 1 (repeatedly, i.e. dead-end chains). Such nodes are never needed to
+#    connect the reserves, but they may still add profit to a corridor, so this is only correct for Steiner tree
+#    calculations, not for the full max-profit problem.
+#
+# The reserves are never removed. The .dist3 values are read from a given .dist3 file or calculated on the instance
+# without the unavailable nodes, where instances with many reserves use the cheaper bound of the farthest reserve.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import os
+import re
+from argparse import ArgumentParser
+from array import array
+
+from budget_calculation import is_valid_file, get_default_output_file
+from dist3_calculation import calculate_dist3, read_dist3_file
+from instance_reader import read_instance, read_cor_lines, format_node_line, CorInstance
+from min_cost_path_calculation import node_weighted_dijkstra
+from steiner_tree import EXACT_MAX_TERMINALS
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design instance reduction")
+    parser.add_argument("-i", dest="instance_file", required=True,
+                        help=".cor instance file (or binary instance file)", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-o", dest="output_file", required=False, default="",
+                        help="the reduced .cor instance file; by default the instance file name with suffix _reduced",
+                        metavar="FILE")
+    parser.add_argument("-m", dest="mapping_file", required=False, default="",
+                        help="the file mapping the node ids of the reduced instance to the original node ids; by "
+                             "default the reduced instance file name with extension .map", metavar="FILE")
+    parser.add_argument("-d", dest="dist3_file", required=False, default=None,
+                        help="the .dist3 file of the instance; calculated if not given", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-b", dest="budget", required=False, default=None, type=int,
+                        help="the budget to prune against; by default the budget of the 'b' line of the instance")
+    parser.add_argument("-u", dest="unavailable_cost", required=False, default=None, type=int,
+                        help="nodes with at least this cost are unavailable and removed, e.g. 999999 for the Grizzly "
+                             "instances; by default the nodes that cost more than the budget")
+    parser.add_argument("--steiner-only", dest="steiner_only", required=False, action="store_true",
+                        help="also remove dead-end chains of non-reserve nodes, which is only correct for Steiner "
+                             "tree calculations, since these nodes may add profit to a corridor")
+    return parser.parse_args()
+
+
+def create_induced_instance(instance: CorInstance, keep) -> (CorInstance, array):
+    """
+    Creates the instance induced by the given nodes, where the kept nodes are renumbered consecutively in the order
+    of their original ids.
+
+    :param instance: the instance
+    :param keep: 0-1 entry per node of the instance, whether to keep the node
+    :return: the induced instance, and the original id of each of its nodes
+    """
+    original_ids = array("q", (node for node in range(0, instance.nb_nodes) if keep[node]))
+    new_ids = array("q", [-1]) * instance.nb_nodes
+    for new_id, node in enumerate(original_ids):
+        new_ids[node] = new_id
+    neighbour_offsets = array("q", [0])
+    neighbour_indices = array("q")
+    for node in original_ids:
+        neighbour_indices.extend(new_ids[neighbour] for neighbour in instance.neighbours(node) if keep[neighbour])
+        neighbour_offsets.append(len(neighbour_indices))
+    is_reserve = array("b", (instance.is_reserve[node] for node in original_ids))
+    induced_instance = CorInstance(len(original_ids), sum(is_reserve), is_reserve,
+                                   array("q", (instance.profit[node] for node in original_ids)),
+                                   array("q", (instance.cost[node] for node in original_ids)),
+                                   neighbour_offsets, neighbour_indices, instance.budget)
+    return induced_instance, original_ids
+
+
+def calculate_node_lower_bounds(instance: CorInstance, max_reserves: int = EXACT_MAX_TERMINALS) -> array:
+    """
+    Calculates, for every node, a lower bound on the cost of a connected set of nodes that contains the node and all
+    reserves: the .dist3 value for up to max_reserves reserves, and otherwise the cost of the cheapest path from the
+    node to the farthest reserve.
+
+    :return: the lower bound for each node (infinity if the node is not connected to all reserves)
+    """
+    reserves = instance.reserves()
+    if len(reserves) <= max_reserves:
+        return calculate_dist3(instance)
+    lower_bound = array("d", [0]) * instance.nb_nodes
+    for reserve in reserves:
+        distance, predecessor = node_weighted_dijkstra(instance.nb_nodes, instance.neighbours, instance.cost,
+                                                       [reserve])
+        for node in range(0, instance.nb_nodes):
+            lower_bound[node] = max(lower_bound[node], distance[node] + instance.cost[reserve])
+    return lower_bound
+
+
+def mark_nodes_connected_to_reserves(instance: CorInstance, keep: bytearray) -> int:
+    """
+    Unmarks all kept nodes that are not connected to a reserve through kept nodes.
+
+    :return: the number of unmarked nodes
+    """
+    reached = bytearray(instance.nb_nodes)
+    stack = [node for node in instance.reserves() if keep[node]]
+    for node in stack:
+        reached[node] = 1
+    while stack:
+        node = stack.pop()
+        for neighbour in instance.neighbours(node):
+            if keep[neighbour] and not reached[neighbour]:
+                reached[neighbour] = 1
+                stack.append(neighbour)
+    nb_removed = 0
+    for node in range(0, instance.nb_nodes):
+        if keep[node] and not reached[node]:
+            keep[node] = 0
+            nb_removed = nb_removed + 1
+    return nb_removed
+
+
+def remove_dead_ends(instance: CorInstance, keep: bytearray) -> int:
+    """
+    Repeatedly unmarks the kept non-reserve nodes with at most one kept neighbour.
+
+    :return: the number of unmarked nodes
+    """
+    degree = array("q", [0]) * instance.nb_nodes
+    for node in range(0, instance.nb_nodes):
+        if keep[node]:
+            degree[node] = sum(keep[neighbour] for neighbour in instance.neighbours(node))
+    stack = [node for node in range(0, instance.nb_nodes)
+             if keep[node] and degree[node] <= 1 and not instance.is_reserve[node]]
+    nb_removed = 0
+    while stack:
+        node = stack.pop()
+        if not keep[node]:
+            continue
+        keep[node] = 0
+        nb_removed = nb_removed + 1
+        for neighbour in instance.neighbours(node):
+            if keep[neighbour]:
+                degree[neighbour] = degree[neighbour] - 1
+                if degree[neighbour] <= 1 and not instance.is_reserve[neighbour]:
+                    stack.append(neighbour)
+    return nb_removed
+
+
+def reduce_instance(instance: CorInstance, budget: int = None, unavailable_cost: int = None,
+                    dist3: dict = None, steiner_only: bool = False) -> (CorInstance, array, dict):
+    """
+    Removes the nodes that cannot be part of a corridor within the budget from the given instance.
+
+    :param instance: the instance
+    :param budget: the budget to prune against, or None to skip the pruning by .dist3 values
+    :param unavailable_cost: nodes with at least this cost are unavailable and removed, or None to remove the nodes
+    that cost more than the budget
+    :param dist3: the .dist3 value of each node, by original node id; calculated if not given
+    :param steiner_only: whether to also remove dead-end chains of non-reserve nodes
+    :return: the reduced instance, the original id of each of its nodes, and the number of nodes removed by each step
+    """
+    if unavailable_cost is None:
+        unavailable_cost = budget + 1 if budget is not None else float("inf")
+    keep = bytearray(1 if instance.is_reserve[node] or instance.cost[node] < unavailable_cost else 0
+                     for node in range(0, instance.nb_nodes))
+    nb_removed = {"unavailable": instance.nb_nodes - sum(keep)}
+    nb_removed["budget"] = 0
+    if budget is not None:
+        if dist3 is None:
+            available_instance, original_ids = create_induced_instance(instance, keep)
+            lower_bound = calculate_node_lower_bounds(available_instance)
+            dist3 = {original_ids[node]: lower_bound[node] for node in range(0, available_instance.nb_nodes)}
+        for node in range(0, instance.nb_nodes):
+            if keep[node] and not instance.is_reserve[node] and dist3.get(node, float("inf")) > budget:
+                keep[node] = 0
+                nb_removed["budget"] = nb_removed["budget"] + 1
+    nb_removed["unreachable"] = mark_nodes_connected_to_reserves(instance, keep)
+    nb_removed["dead_end"] = remove_dead_ends(instance, keep) if steiner_only else 0
+    reduced_instance, original_ids = create_induced_instance(instance, keep)
+    return reduced_instance, original_ids, nb_removed
+
+
+def write_reduced_instance_file(instance_file: str, output_file: str, reduced_instance: CorInstance,
+                                original_ids: array) -> None:
+    """
+    Writes the reduced instance in .cor format, keeping the comments and the budget line of the original instance file
+    and updating the node count and the reserve ids in the comments.
+    """
+    reserves = iter(reduced_instance.reserves())
+    with open(output_file, "w", newline="") as f:
+        for line in read_cor_lines(instance_file):
+            if line.startswith("n"):
+                continue
+            elif line.startswith("p"):
+                f.write("c reduced from " + os.path.basename(instance_file) + ", keeping " +
+                        str(reduced_instance.nb_nodes) + " nodes\n")
+                f.write("p " + str(reduced_instance.nb_nodes) + " " + str(reduced_instance.nb_reserves) + " \n")
+                for node in range(0, reduced_instance.nb_nodes):
+                    f.write(format_node_line(reduced_instance, node))
+            elif re.match(r"c n = \d+", line):
+                f.write("c n = " + str(reduced_instance.nb_nodes) + "\n")
+            elif re.match(r"c reserve \d+", line):
+                f.write("c reserve " + str(next(reserves, "")) + "\n")
+            else:
+                f.write(line)
+
+
+def write_mapping_file(mapping_file: str, original_ids: array) -> None:
+    """ Writes one line "new_id original_id" for each node of the reduced instance """
+    with open(mapping_file, "w") as f:
+        for new_id, node in enumerate(original_ids):
+            f.write(str(new_id) + " " + str(node) + "\n")
+
+
+def read_mapping_file(mapping_file: str) -> array:
+    """ Reads the original id of each node of a reduced instance from the given mapping file """
+    original_ids = array("q")
+    with open(mapping_file) as f:
+        for line in f:
+            vals = line.split()
+            if len(vals) == 2:
+                if int(vals[0]) != len(original_ids):
+                    raise ValueError("The mapping file " + mapping_file + " does not list the nodes in order")
+                original_ids.append(int(vals[1]))
+    return original_ids
+
+
+def get_default_mapping_file(output_file: str) -> str:
+    """ Returns the reduced instance file name with the .cor extension replaced by .map """
+    return (output_file[:-len(".cor")] if output_file.endswith(".cor") else output_file) + ".map"
+
+
+def main():
+    args = parse_args()
+    instance = read_instance(args.instance_file)
+    budget = args.budget if args.budget is not None else instance.budget
+    if budget is None:
+        print("The instance has no budget, so nodes are not pruned against the budget")
+    dist3 = read_dist3_file(args.dist3_file) if args.dist3_file is not None else None
+    reduced_instance, original_ids, nb_removed = reduce_instance(instance, budget, args.unavailable_cost, dist3,
+                                                                 args.steiner_only)
+    output_file = args.output_file
+    if output_file == "":
+        output_file = get_default_output_file(args.instance_file, "_reduced.cor")
+    mapping_file = args.mapping_file if args.mapping_file != "" else get_default_mapping_file(output_file)
+    write_reduced_instance_file(args.instance_file, output_file, reduced_instance, original_ids)
+    write_mapping_file(mapping_file, original_ids)
+    print("Removed " + ", ".join(str(count) + " " + step for step, count in nb_removed.items()) + " nodes")
+    print("Wrote reduced instance with " + str(reduced_instance.nb_nodes) + " of " + str(instance.nb_nodes) +
+          " nodes: " + output_file + " (mapping: " + mapping_file + ")")
+
+
+if __name__ == "__main__":
+    main()
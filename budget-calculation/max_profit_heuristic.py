@@ -0,0 +1,234 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Greedy primal heuristic for the Wildlife Corridor Design problem
+#
+# Calculates a feasible corridor, i.e. a connected set of parcels that contains all reserves and whose total cost is
+# within the budget, with a high total utility (profit). The corridor can be handed to exact solvers as a starting
+# solution.
+#
+# ------ Algorithm: -----------------------------------------------------------------
+#
+# 1. Start from the (approximate) minimal Steiner tree of the reserves, the cheapest way to connect the reserves.
+# 2. Grow the corridor greedily: the parcels adjacent to the corridor are kept in a priority queue ordered by their
+#    profit-to-cost ratio. Repeatedly add the parcel with the best ratio whose cost fits into the remaining budget,
+#    and add its neighbours to the queue. A parcel that does not fit into the remaining budget never fits again.
+# 3. Optionally, improve the corridor by swaps: remove a parcel that is a leaf of the corridor (i.e. that has a single
+#    neighbour in the corridor) and add a more profitable parcel adjacent to the rest of the corridor that fits into
+#    the budget. The leaves and the adjacent parcels are kept in priority queues, least profitable leaf and most
+#    profitable parcel first, which are updated with each swap. After a round of swaps, grow the corridor greedily
+#    again, and repeat until no leaf can be swapped.
+#
+# The solution is written in the format of the .minsteiner files: the first line states the cost and the utility of
+# the corridor, the second line lists its parcels.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import sys
+from argparse import ArgumentParser
+from array import array
+from heapq import heapify, heappop, heappush
+
+from budget_calculation import is_valid_file, get_default_output_file
+from instance_reader import read_instance, CorInstance
+from steiner_tree import calculate_steiner_tree, STEINER_TREE_MODES
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design greedy max-profit heuristic")
+    parser.add_argument("-i", dest="instance_file", required=True,
+                        help=".cor instance file (or binary instance file)", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-o", dest="output_file", required=False, default="",
+                        help="the solution file to write; by default the instance file name with extension .sol",
+                        metavar="FILE")
+    parser.add_argument("-b", dest="budget", required=False, default=None, type=int,
+                        help="the budget; by default the budget of the 'b' line of the instance")
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
+                        help="the seed for the steiner tree approximation algorithm")
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="calculate the exact minimal steiner tree or the approximation as starting corridor")
+    parser.add_argument("--swap", dest="swap", required=False, action="store_true",
+                        help="improve the corridor by swapping leaf parcels for more profitable parcels")
+    return parser.parse_args()
+
+
+def get_ratio_key(instance: CorInstance, node: int) -> tuple:
+    """ Returns the priority queue key of the given node: best profit-to-cost ratio first, then highest profit """
+    cost = instance.cost[node]
+    ratio = instance.profit[node] / cost if cost > 0 else float("inf")
+    return -ratio, -instance.profit[node], node
+
+
+def grow_corridor(instance: CorInstance, in_corridor: bytearray, remaining_budget: int) -> int:
+    """
+    Greedily adds the parcels adjacent to the corridor with the best profit-to-cost ratio, as long as they fit into the
+    remaining budget.
+
+    :param instance: the instance
+    :param in_corridor: 0-1 entry per node, whether the node is in the corridor, which is extended in place
+    :param remaining_budget: the budget that is not used by the corridor
+    :return: the remaining budget after growing the corridor
+    """
+    queued = bytearray(in_corridor)
+    queue = []
+    for node in range(0, instance.nb_nodes):
+        if in_corridor[node]:
+            for neighbour in instance.neighbours(node):
+                if not queued[neighbour]:
+                    queued[neighbour] = 1
+                    heappush(queue, get_ratio_key(instance, neighbour))
+    while queue:
+        node = heappop(queue)[2]
+        if instance.cost[node] > remaining_budget:
+            continue  # the remaining budget only decreases, so the node never fits
+        in_corridor[node] = 1
+        remaining_budget = remaining_budget - instance.cost[node]
+        for neighbour in instance.neighbours(node):
+            if not queued[neighbour]:
+                queued[neighbour] = 1
+                heappush(queue, get_ratio_key(instance, neighbour))
+    return remaining_budget
+
+
+def is_leaf(instance: CorInstance, in_corridor: bytearray, corridor_neighbours: array, node: int) -> bool:
+    """ Checks if the given node is a parcel of the corridor that is not a reserve and has one neighbour in it """
+    return in_corridor[node] and not instance.is_reserve[node] and corridor_neighbours[node] == 1
+
+
+def find_best_swap(instance: CorInstance, in_corridor: bytearray, corridor_neighbours: array, candidates: list,
+                   remaining_budget: int, leaf: int) -> int:
+    """
+    Returns the most profitable parcel that can replace the given leaf of the corridor, i.e. that is adjacent to the
+    corridor without the leaf, fits into the budget without the leaf and is more profitable than the leaf, or -1 if
+    there is none.
+
+    :param instance: the instance
+    :param in_corridor: 0-1 entry per node, whether the node is in the corridor
+    :param corridor_neighbours: the number of neighbours in the corridor of each node
+    :param candidates: the priority queue of the parcels adjacent to the corridor, most profitable first, which may
+    contain outdated entries of parcels that are no longer adjacent to the corridor
+    :param remaining_budget: the budget that is not used by the corridor
+    :param leaf: the leaf to replace
+    :return: the parcel that replaces the leaf, or -1
+    """
+    budget = remaining_budget + instance.cost[leaf]
+    leaf_neighbours = instance.neighbours(leaf)
+    best_node = -1
+    skipped = []  # the candidates that do not fit, but may replace other leaves
+    while candidates and -candidates[0][0] > instance.profit[leaf]:
+        entry = heappop(candidates)
+        node = entry[1]
+        if in_corridor[node] or corridor_neighbours[node] == 0:
+            continue  # outdated entry
+        skipped.append(entry)
+        if instance.cost[node] <= budget and corridor_neighbours[node] > (1 if node in leaf_neighbours else 0):
+            best_node = node
+            break
+    for entry in skipped:
+        heappush(candidates, entry)
+    return best_node
+
+
+def swap_leaves(instance: CorInstance, in_corridor: bytearray, remaining_budget: int) -> int:
+    """
+    Improves the corridor by replacing non-reserve leaves with more profitable parcels, starting with the least
+    profitable leaf, and grows the corridor greedily after each round of swaps, until no leaf can be swapped any more.
+    The leaves and the parcels adjacent to the corridor are kept in priority queues that are updated with each swap.
+
+    :return: the remaining budget after the swaps
+    """
+    improved = True
+    while improved:
+        improved = False
+        corridor_neighbours = array("q", [0]) * instance.nb_nodes
+        for node in range(0, instance.nb_nodes):
+            if in_corridor[node]:
+                for neighbour in instance.neighbours(node):
+                    corridor_neighbours[neighbour] = corridor_neighbours[neighbour] + 1
+        candidates = [(-instance.profit[node], node) for node in range(0, instance.nb_nodes)
+                      if not in_corridor[node] and corridor_neighbours[node] > 0]
+        heapify(candidates)
+        leaves = [(instance.profit[node], node) for node in range(0, instance.nb_nodes)
+                  if is_leaf(instance, in_corridor, corridor_neighbours, node)]
+        heapify(leaves)
+        while leaves:
+            leaf = heappop(leaves)[1]
+            if not is_leaf(instance, in_corridor, corridor_neighbours, leaf):
+                continue  # no longer a leaf after an earlier swap
+            node = find_best_swap(instance, in_corridor, corridor_neighbours, candidates, remaining_budget, leaf)
+            if node < 0:
+                continue
+            in_corridor[leaf] = 0
+            for neighbour in instance.neighbours(leaf):
+                corridor_neighbours[neighbour] = corridor_neighbours[neighbour] - 1
+                if is_leaf(instance, in_corridor, corridor_neighbours, neighbour):
+                    heappush(leaves, (instance.profit[neighbour], neighbour))
+            heappush(candidates, (-instance.profit[leaf], leaf))
+            in_corridor[node] = 1
+            for neighbour in instance.neighbours(node):
+                corridor_neighbours[neighbour] = corridor_neighbours[neighbour] + 1
+                if not in_corridor[neighbour] and corridor_neighbours[neighbour] == 1:
+                    heappush(candidates, (-instance.profit[neighbour], neighbour))
+            if is_leaf(instance, in_corridor, corridor_neighbours, node):
+                heappush(leaves, (instance.profit[node], node))
+            remaining_budget = remaining_budget + instance.cost[leaf] - instance.cost[node]
+            improved = True
+        if improved:
+            remaining_budget = grow_corridor(instance, in_corridor, remaining_budget)
+    return remaining_budget
+
+
+def calculate_max_profit_corridor(instance: CorInstance, budget: int, seed: int, mode: str = "auto",
+                                  swap: bool = False) -> (list, int, int):
+    """
+    Calculates a corridor with high profit within the budget, starting from the minimal Steiner tree of the reserves.
+
+    :param instance: the instance
+    :param budget: the budget
+    :param seed: the seed for the Steiner tree approximation
+    :param mode: the Steiner tree calculation, see calculate_steiner_tree
+    :param swap: whether to improve the corridor by swapping leaves
+    :return: the parcels of the corridor, its cost and its profit
+    """
+    steiner_tree, steiner_tree_cost = calculate_steiner_tree(instance, instance.reserves(), seed, mode)
+    if steiner_tree_cost > budget:
+        raise ValueError("The budget " + str(budget) + " is smaller than the cost of the Steiner tree of the "
+                         "reserves (" + str(steiner_tree_cost) + "), so no corridor is found")
+    in_corridor = bytearray(instance.nb_nodes)
+    for node in steiner_tree.nodes():
+        in_corridor[node] = 1
+    remaining_budget = grow_corridor(instance, in_corridor, budget - steiner_tree_cost)
+    if swap:
+        remaining_budget = swap_leaves(instance, in_corridor, remaining_budget)
+    nodes = [node for node in range(0, instance.nb_nodes) if in_corridor[node]]
+    return nodes, budget - remaining_budget, sum(instance.profit[node] for node in nodes)
+
+
+def write_solution_file(solution_file: str, nodes: list, cost: int, profit: int) -> None:
+    """ Writes the corridor in the format of the .minsteiner files: "cost profit", then the list of parcels """
+    with open(solution_file, "w") as f:
+        f.write(str(cost) + " " + str(profit) + "\n")
+        f.write(" ".join(map(str, nodes)) + "\n")
+
+
+def main():
+    args = parse_args()
+    instance = read_instance(args.instance_file)
+    budget = args.budget if args.budget is not None else instance.budget
+    if budget is None:
+        print("The instance has no budget, please specify a budget (-b)")
+        sys.exit(1)
+    nodes, cost, profit = calculate_max_profit_corridor(instance, budget, args.seed, args.mode, args.swap)
+    output_file = args.output_file if args.output_file != "" else get_default_output_file(args.instance_file, ".sol")
+    write_solution_file(output_file, nodes, cost, profit)
+    print("Found corridor with " + str(len(nodes)) + " parcels, cost " + str(cost) + " (budget " + str(budget) +
+          ") and profit " + str(profit) + ": " + output_file)
+
+
+if __name__ == "__main__":
+    main()
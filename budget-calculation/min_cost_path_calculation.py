@@ -4,9 +4,10 @@
 # Implementation for finding the minimal node-cost path from a source to a target node
 # on an undirected graph.
 #
-# The implementation creates the respective line graph (where nodes are converted into
-# edges) and calculates the shortest path on the line graph and converts the result for
-# the original graph.
+# The implementation runs Dijkstra's algorithm directly on the node weights: entering a
+# node costs the cost of that node, the source nodes are free. The search works on any
+# graph that can list the neighbours of a node, in particular on the compact CSR
+# representation of an instance (CorInstance) and on NetworkX graphs.
 #
 # This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
 # See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
@@ -14,132 +15,109 @@
 # Author: Andrea Rendl-Pitrey, Satalia, October 2020
 # ----------------------------------------------------------------------------------------------------------------------
 
+import time
+from array import array
+from heapq import heapify, heappop, heappush
+
 import networkx as nx
 
+import profiling
+from instance_reader import CorInstance
 
-def adjust_line_graph(source_node: int, target_node: int, line_graph: nx.Graph, original_graph: nx.Graph) -> (
-        nx.Graph, int, int):
-    """
-    Adjust the line graph so that we can apply the shortest path algorithm on it that would represent the min cost
-    algorithm wrt node costs. This means we perform the following steps: First, we need to set the edge weights by
-    applying the cost of the respective node each edge represents. Second, we contract all the terminals in the
-    line graph into one node to simplify calculating the shortest path. Finally, we return the adjusted line graph and
-    the source and target nodes to calculate the shortest path.
 
-    :param source_node: the source node from the main graph from which we want to compute the min cost path to the target
-    :param target_node: the target node from the main graph
-    :param line_graph: the line graph obtained by NetworkX for the main graph
-    :param original_graph: the original graph that the line graph represents
-    :return: the adjusted line graph and the source and target node in the line graph for the shortest path computation
+def get_search_structure(graph) -> (int, callable, object):
     """
-    # set the costs on the edges of the line graph to the cost of the node that appears in both adjacent nodes
-    node_costs = nx.get_node_attributes(original_graph, 'cost')
-    for edge in list(line_graph.edges()):
-        # the edge connects two nodes: (n1, n2) <--> (n3, n4), where (n1, n2) is node_a, and (n3,n4) is node_b, and
-        # n1, n2, n3, n4 are nodes in the original graph, and 2 nodes of n1, n2, n3, n4 are the same. We set the edge
-        # weight as the cost of the node that appears twice in n1, n2, n3, n4.
-        node_a = edge[0]
-        node_b = edge[1]
-        if node_a[0] == node_b[0] or node_a[0] == node_b[1]:
-            node_appearing_twice = node_a[0]
-        else:
-            node_appearing_twice = node_a[1]
-        line_graph[node_a][node_b]["cost"] = node_costs[node_appearing_twice]
-        line_graph[node_b][node_a]["cost"] = node_costs[node_appearing_twice]
-
-    # contract the nodes for the source and target terminal
-    source_nodes = []
-    target_nodes = []
-    # find all nodes that are associated with the source or target nodes
-    for node in list(line_graph.nodes()):
-        if node[0] == source_node or node[1] == source_node:
-            source_nodes.append(node)
-        elif node[0] == target_node or node[1] == target_node:
-            target_nodes.append(node)
-
-    # pick the first terminal-1 node as source node and contract all other nodes to it
-    source = source_nodes[0]
-    # TODO: check if contracting makes sense
-    # if len(source_nodes) > 1:
-    #     for i in range(1, len(source_nodes) - 1):
-    #         line_graph = nx.contracted_nodes(line_graph, source, source_nodes[i])
-    # pick the first terminal-2 node as target node and contract all other nodes to it
-    target = target_nodes[0]
-    # if len(target_nodes) > 1:
-    #     for i in range(1, len(target_nodes) - 1):
-    #         line_graph = nx.contracted_nodes(line_graph, target, target_nodes[i])
-
-    return line_graph, source, target
-
+    Returns the structure of the given graph that the node-weighted Dijkstra search works on.
 
-def calculate_path_cost_on_line_graph(path: list, line_graph: nx.Graph) -> int:
-    edge_costs = nx.get_edge_attributes(line_graph, 'cost')
-    cost = 0
-    for i in range(0, len(path) - 1):
-        if (path[i], path[i + 1]) in edge_costs.keys():
-            cost = cost + edge_costs[(path[i], path[i + 1])]
-        else:
-            cost = cost + edge_costs[(path[i + 1], path[i])]
-    return cost
+    :param graph: either a CorInstance or a NetworkX graph with integer nodes labelled with 'cost'
+    :return: the upper bound on the node ids, a function returning the neighbours of a node, and the array of node
+    costs indexed by node
+    """
+    if isinstance(graph, CorInstance):
+        return graph.nb_nodes, graph.neighbours, graph.cost
+    nb_nodes = max(graph.nodes(), default=-1) + 1
+    cost = array("q", [0]) * nb_nodes
+    for node, node_cost in graph.nodes(data="cost"):
+        cost[node] = node_cost
+    return nb_nodes, graph.adj.__getitem__, cost
 
 
-def convert_line_graph_path(path: list) -> list:
+def node_weighted_dijkstra(nb_nodes: int, neighbours: callable, cost, sources: list, target: int = None,
+                           sinks=None, source_distances: list = None) -> (array, array):
     """
-    Converts the given shortest path for the line graph into the min cost path in the original path. In principle, this
-    means extracting the nodes in the right order from the given line graph path. The given line-graph path looks like:
-    (n1, n2), (n3, n4) ... (ni, ni+1) where each (ni,nj) is a node in the line graph, and each ni is a node in the
-    original graph. The nodes in (ni, nj) are ordered so that ni < nj. So we need to determine the "right order" to
-    extract the path, by determining the nodes that are the same.
-
-    Example:
-    line graph path: (10, 11), (9, 10), (8, 9), (8, 14) represents the path: 11 -> 10 -> 9 -> 8 -> 14,
-    This means the interpretation of line graph path is: (11, 10), (10, 9), (9, 8), (8, 14)
-    and the returned path: (11, 10, 9, 8, 14)
-    :param path: the shortest path on the line graph
-    :return: the equivalent min cost path on the original graph
+    Heap-based Dijkstra search where entering a node costs the cost of that node. All source nodes start with
+    distance 0, so searching from several sources at once computes the distance to the closest source.
+
+    :param nb_nodes: upper bound on the node ids
+    :param neighbours: function that returns the neighbours of a given node
+    :param cost: the node costs, indexed by node
+    :param sources: the nodes from which to start the search
+    :param target: if given, the search stops as soon as the distance to the target is final
+    :param sinks: if given, a collection of nodes that are reached, but not expanded by the search
+    :param source_distances: if given, the initial distance of each source instead of 0
+    :return: the distance of each node, i.e. the sum of the node costs of the cheapest path from a source to the node
+    excluding the source, and the predecessor of each node on that path (-1 for sources and unreached nodes)
     """
-    # finding the source and target node from the first path element
-    node_a = path[0][0]
-    node_b = path[0][1]
-    if node_a == path[1][0] or node_a == path[1][1]:
-        node_source = node_b
-        node_target = node_a
-    else:
-        node_source = node_a
-        node_target = node_b
-    converted_path = [node_source]
-    node_source = node_target
-
-    # iterate over path, adding the next node ni
-    for i in range(1, len(path)):
-        node_a = path[i][0]
-        node_b = path[i][1]
-        if node_a == node_source:
-            node_target = node_b
-        else:
-            node_target = node_a
-        converted_path.append(node_source)
-        node_source = node_target
-    converted_path.append(node_source)  # add the last node
-
-    return converted_path
-
-
-def calculate_min_cost_path(source_node: int, target_node: int, graph: nx.Graph) -> (list, int):
+    profile = profiling.active_profile
+    start_time = time.perf_counter() if profile is not None else 0.0
+    distance = array("d", [float("inf")]) * nb_nodes
+    predecessor = array("q", [-1]) * nb_nodes
+    settled = bytearray(nb_nodes)
+    heap = []
+    for i in range(0, len(sources)):
+        source_distance = 0 if source_distances is None else source_distances[i]
+        if source_distance < distance[sources[i]]:
+            distance[sources[i]] = source_distance
+            heap.append((source_distance, sources[i]))
+    heapify(heap)
+    while heap:
+        node_distance, node = heappop(heap)
+        if settled[node]:
+            continue
+        settled[node] = 1
+        if node == target:
+            break
+        if sinks is not None and node in sinks:
+            continue
+        for neighbour in neighbours(node):
+            neighbour_distance = node_distance + cost[neighbour]
+            if neighbour_distance < distance[neighbour]:
+                distance[neighbour] = neighbour_distance
+                predecessor[neighbour] = node
+                heappush(heap, (neighbour_distance, neighbour))
+    if profile is not None:
+        profile.add_phase_time("path_search", start_time, time.perf_counter() - start_time)
+        profile.count("path_searches")
+        profile.count("nodes_settled", settled.count(1))
+    return distance, predecessor
+
+
+def extract_path(predecessor: array, target: int) -> list:
+    """ Returns the path from the source of the search to the given target, following the predecessors. """
+    path = [target]
+    while predecessor[path[-1]] >= 0:
+        path.append(predecessor[path[-1]])
+    path.reverse()
+    return path
+
+
+def calculate_min_cost_path(source_node: int, target_node: int, graph) -> (list, int):
     """
-    Calculates the minimal cost path with respect to node-weights from terminal1 to terminal2 on the given graph by
-    converting the graph into a line graph (converting nodes to edges) and solving the respective shortest path problem
-    on the edges.
+    Calculates the minimal cost path with respect to node-weights from terminal1 to terminal2 on the given graph with
+    a node-weighted Dijkstra search that stops as soon as the target is reached.
 
     :param source_node: the source node from the given graph from which to calculate the min cost path to the target
     :param target_node: the target node from the given graph
     :param graph: the graph on which we want to find the min cost path from source to target with respect to
-    the node weights that are labelled with 'cost'
-    :return: the min cost path from source to target, and the cost of the path, with respect to the node costs
+    the node weights; either a CorInstance or a NetworkX graph whose nodes are labelled with 'cost'
+    :return: the min cost path from source to target, and the cost of the path, with respect to the node costs of the
+    nodes between source and target
     """
-    line_graph = nx.line_graph(graph)
-    line_graph, source, target = adjust_line_graph(source_node, target_node, line_graph, graph)
-    path = nx.shortest_path(line_graph, source, target, weight="cost")
-    cost = calculate_path_cost_on_line_graph(path, line_graph)
-    path = convert_line_graph_path(path)
-    return path, cost
+    nb_nodes, neighbours, cost = get_search_structure(graph)
+    distance, predecessor = node_weighted_dijkstra(nb_nodes, neighbours, cost, [source_node], target=target_node)
+    if distance[target_node] == float("inf"):
+        raise nx.NetworkXNoPath("No path between " + str(source_node) + " and " + str(target_node) + ".")
+    path = extract_path(predecessor, target_node)
+    if len(path) == 1:
+        return path, 0
+    return path, int(distance[target_node]) - cost[target_node]
@@ -0,0 +1,230 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Multi-level (coarse-to-fine) node-weighted Minimal Steiner Tree approximation
+#
+# Calculates the Steiner tree of the reserves of a large instance by first solving the problem on a coarse version of
+# the instance and then only searching the fine instance within a band around the coarse solution.
+#
+# ------ Algorithm: -----------------------------------------------------------------
+#
+# 1. Coarsen the fine instance: grow clusters of up to k nodes by breadth-first search from the nodes in the order
+#    of their ids, where a cluster only takes nodes of similar cost to its first node (at most twice as expensive and
+#    at least half as expensive), so that cheap parcels are not merged with expensive or unavailable ones. Each
+#    cluster becomes a node of the coarse instance with the average cost of its nodes, and two clusters are adjacent
+#    if any of their nodes are adjacent. Alternatively, a coarse instance of the same landscape
+#    (e.g. a coarser Grizzly tier) and a mapping from the fine nodes to the coarse nodes are given.
+# 2. Calculate the Steiner tree on the coarse instance, where the terminals are the clusters of the reserves.
+# 3. Project the coarse Steiner tree onto the fine instance: the band consists of all fine nodes in the clusters of
+#    the coarse tree, widened by w breadth-first layers in the fine instance.
+# 4. Calculate the Steiner tree on the fine instance restricted to the band. If the band does not connect the
+#    reserves, double the width of the band and try again, until widening the band adds no more nodes.
+#
+# The result is an approximation that may be more expensive than the Steiner tree calculated on the whole instance;
+# the benchmark (benchmark.py -m multilevel) reports the gap to the optimal Steiner tree. The calculation is
+# experimental and opt-in; no other script uses it. It does not reach an order-of-magnitude speedup: on generated grids
+# with random costs, the coarse instance keeps more than a quarter of the nodes, so the calculation is less than twice
+# as fast as the approximation on the whole instance, with 4-9% more expensive trees, and on the 10x10 Grizzly
+# instance the tree is 13% more expensive than the optimal tree.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+from argparse import ArgumentParser
+from array import array
+from collections import deque
+
+import networkx as nx
+
+from budget_calculation import is_valid_file
+from instance_reader import read_instance, CorInstance
+from instance_reduction import create_induced_instance, read_mapping_file, write_mapping_file
+from steiner_tree import calculate_steiner_tree, STEINER_TREE_MODES
+from steiner_tree_approximation import create_steiner_tree_graph
+
+DEFAULT_CLUSTER_SIZE = 16
+DEFAULT_BAND_WIDTH = 5
+COST_SIMILARITY_FACTOR = 2  # the factor by which the costs of the nodes of a cluster may differ from its first node
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design multi-level steiner tree calculation (experimental, "
+                                        "less than twice as fast and more expensive trees than -m approximate)")
+    parser.add_argument("-i", dest="instance_file", required=True,
+                        help=".cor instance file (or binary instance file)", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-c", dest="coarse_instance_file", required=False, default=None,
+                        help="a coarse instance of the same landscape; by default the instance is coarsened by "
+                             "clustering", metavar="FILE", type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-p", dest="mapping_file", required=False, default=None,
+                        help="the mapping of the coarse instance, with one line 'fine_id coarse_id' for each node of "
+                             "the instance, in the order of the node ids", metavar="FILE",
+                        type=lambda x: is_valid_file(parser, x))
+    parser.add_argument("-k", dest="cluster_size", required=False, default=DEFAULT_CLUSTER_SIZE, type=int,
+                        help="the maximal number of nodes of a cluster when coarsening (default %d)" %
+                             DEFAULT_CLUSTER_SIZE)
+    parser.add_argument("-w", dest="band_width", required=False, default=DEFAULT_BAND_WIDTH, type=int,
+                        help="the initial number of layers by which the band around the coarse solution is widened "
+                             "(default %d)" % DEFAULT_BAND_WIDTH)
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
+                        help="the seed for the steiner tree approximation algorithm")
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="the steiner tree calculation on the coarse instance and in the band")
+    parser.add_argument("--write-mapping", dest="output_mapping_file", required=False, default="",
+                        help="write the mapping of the clustering into the given file", metavar="FILE")
+    args = parser.parse_args()
+    if (args.coarse_instance_file is None) != (args.mapping_file is None):
+        parser.error("A coarse instance (-c) requires a mapping (-p), and vice versa")
+    return args
+
+
+def cluster_nodes(instance: CorInstance, cluster_size: int) -> array:
+    """
+    Groups the nodes of the instance into connected clusters of up to cluster_size nodes, grown by breadth-first
+    search from the unclustered nodes in the order of their ids. A cluster only grows into nodes whose cost differs
+    by at most the COST_SIMILARITY_FACTOR from the cost of its first node.
+
+    :return: the cluster of each node
+    """
+    cluster = array("q", [-1]) * instance.nb_nodes
+    nb_clusters = 0
+    for start_node in range(0, instance.nb_nodes):
+        if cluster[start_node] >= 0:
+            continue
+        cluster[start_node] = nb_clusters
+        cluster_nodes_left = cluster_size - 1
+        start_cost = instance.cost[start_node]
+        queue = deque([start_node])
+        while queue and cluster_nodes_left > 0:
+            for neighbour in instance.neighbours(queue.popleft()):
+                if cluster[neighbour] < 0 and cluster_nodes_left > 0 and \
+                        instance.cost[neighbour] <= COST_SIMILARITY_FACTOR * start_cost + 1 and \
+                        start_cost <= COST_SIMILARITY_FACTOR * instance.cost[neighbour] + 1:
+                    cluster[neighbour] = nb_clusters
+                    cluster_nodes_left = cluster_nodes_left - 1
+                    queue.append(neighbour)
+        nb_clusters = nb_clusters + 1
+    return cluster
+
+
+def create_coarse_instance(instance: CorInstance, cluster: array) -> CorInstance:
+    """
+    Creates the coarse instance with one node for each cluster, with the average cost of its nodes, where two clusters
+    are adjacent if any of their nodes are adjacent. A cluster is a reserve if it contains a reserve.
+    """
+    nb_clusters = max(cluster, default=-1) + 1
+    total_cost = array("q", [0]) * nb_clusters
+    total_profit = array("q", [0]) * nb_clusters
+    size = array("q", [0]) * nb_clusters
+    is_reserve = array("b", [0]) * nb_clusters
+    adjacent_clusters = [set() for coarse_node in range(0, nb_clusters)]
+    for node in range(0, instance.nb_nodes):
+        coarse_node = cluster[node]
+        total_cost[coarse_node] = total_cost[coarse_node] + instance.cost[node]
+        total_profit[coarse_node] = total_profit[coarse_node] + instance.profit[node]
+        size[coarse_node] = size[coarse_node] + 1
+        is_reserve[coarse_node] = is_reserve[coarse_node] or instance.is_reserve[node]
+        for neighbour in instance.neighbours(node):
+            if cluster[neighbour] != coarse_node:
+                adjacent_clusters[coarse_node].add(cluster[neighbour])
+    neighbour_offsets = array("q", [0])
+    neighbour_indices = array("q")
+    for coarse_node in range(0, nb_clusters):
+        neighbour_indices.extend(sorted(adjacent_clusters[coarse_node]))
+        neighbour_offsets.append(len(neighbour_indices))
+    cost = array("q", (total_cost[coarse_node] // size[coarse_node] for coarse_node in range(0, nb_clusters)))
+    return CorInstance(nb_clusters, sum(is_reserve), is_reserve, total_profit, cost, neighbour_offsets,
+                       neighbour_indices, instance.budget)
+
+
+def get_band(instance: CorInstance, cluster: array, coarse_tree_nodes, width: int) -> bytearray:
+    """
+    Returns the band around the coarse Steiner tree: the nodes in the clusters of the coarse tree, widened by the given
+    number of breadth-first layers.
+
+    :return: 0-1 entry per node, whether the node is in the band
+    """
+    coarse_tree_nodes = set(coarse_tree_nodes)
+    in_band = bytearray(1 if cluster[node] in coarse_tree_nodes else 0 for node in range(0, instance.nb_nodes))
+    layer = [node for node in range(0, instance.nb_nodes) if in_band[node]]
+    for i in range(0, width):
+        next_layer = []
+        for node in layer:
+            for neighbour in instance.neighbours(node):
+                if not in_band[neighbour]:
+                    in_band[neighbour] = 1
+                    next_layer.append(neighbour)
+        layer = next_layer
+    return in_band
+
+
+def multilevel_steiner_tree(instance: CorInstance, terminals: list, seed: int, mode: str = "auto",
+                            cluster_size: int = DEFAULT_CLUSTER_SIZE, band_width: int = DEFAULT_BAND_WIDTH,
+                            coarse_instance: CorInstance = None, cluster: array = None) -> (nx.Graph, int):
+    """
+    Returns an approximate node-weighted minimal Steiner tree, calculated in a band around the Steiner tree of a
+    coarse instance.
+
+    :param instance: the (fine) instance
+    :param terminals: the terminals of the Steiner tree
+    :param seed: the seed for the Steiner tree approximation
+    :param mode: the Steiner tree calculation on the coarse instance and in the band, see calculate_steiner_tree
+    :param cluster_size: the maximal number of nodes of a cluster when coarsening
+    :param band_width: the initial number of layers by which the band is widened
+    :param coarse_instance: if given, the coarse instance to use instead of coarsening the instance
+    :param cluster: the coarse node of each node of the instance, required with coarse_instance
+    :return: the graph representing the Steiner tree and its node cost
+    """
+    if coarse_instance is None:
+        cluster = cluster_nodes(instance, cluster_size)
+        coarse_instance = create_coarse_instance(instance, cluster)
+    coarse_terminals = list(dict.fromkeys(cluster[terminal] for terminal in terminals))
+    coarse_tree, coarse_tree_cost = calculate_steiner_tree(coarse_instance, coarse_terminals, seed, mode)
+    failed_band_size = -1
+    while True:
+        in_band = get_band(instance, cluster, coarse_tree.nodes(), band_width)
+        if in_band.count(1) == failed_band_size:  # widening the band added no nodes
+            raise nx.NetworkXNoPath("The terminals are not connected.")
+        band_instance, original_ids = create_induced_instance(instance, in_band)
+        new_ids = {node: new_id for new_id, node in enumerate(original_ids)}
+        try:
+            band_tree, band_tree_cost = calculate_steiner_tree(band_instance, [new_ids[node] for node in terminals],
+                                                               seed, mode)
+            break
+        except nx.NetworkXNoPath:
+            failed_band_size = band_instance.nb_nodes
+            print("The band of width " + str(band_width) + " does not connect the terminals, widening the band")
+            band_width = max(1, 2 * band_width)
+    print("Calculated the steiner tree in a band of " + str(band_instance.nb_nodes) + " of " +
+          str(instance.nb_nodes) + " nodes around the coarse steiner tree of " + str(coarse_instance.nb_nodes) +
+          " nodes")
+    nodes = [original_ids[node] for node in band_tree.nodes()]
+    edges = [(original_ids[node1], original_ids[node2]) for node1, node2 in band_tree.edges()]
+    return create_steiner_tree_graph(nodes, edges, instance.cost)
+
+
+def main():
+    args = parse_args()
+    instance = read_instance(args.instance_file)
+    coarse_instance = None
+    cluster = None
+    if args.coarse_instance_file is not None:
+        coarse_instance = read_instance(args.coarse_instance_file)
+        cluster = read_mapping_file(args.mapping_file)
+        if len(cluster) != instance.nb_nodes:
+            raise ValueError("The mapping file " + args.mapping_file + " does not map every node of the instance")
+    elif args.output_mapping_file != "":
+        cluster = cluster_nodes(instance, args.cluster_size)
+        coarse_instance = create_coarse_instance(instance, cluster)
+        write_mapping_file(args.output_mapping_file, cluster)
+    steiner_tree, steiner_tree_cost = multilevel_steiner_tree(instance, instance.reserves(), args.seed, args.mode,
+                                                              args.cluster_size, args.band_width, coarse_instance,
+                                                              cluster)
+    print("Calculated multi-level node-weighted steiner tree with cost: " + str(steiner_tree_cost))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Opt-in instrumentation of the budget calculation
+#
+# Records the wall time of the phases of the budget calculation (reading the instance, path searches, Steiner tree
+# calculation, writing the instances) and counters such as the number of path searches, settled nodes, tree merges
+# and the peak number of trees. Optionally, the whole run is captured with cProfile and tracemalloc.
+#
+# Profiling is off unless a profile is started, e.g.:
+#
+#     with profiling.profiled() as profile:
+#         calculate_lower_bound_for_budget("my_instance.cor", 11)
+#     print(profile.to_dict())
+#
+# When profiling is off, phase() returns a shared no-op context manager and the counters are only updated behind a
+# single check of active_profile per search or merge, never inside the inner loops, so the algorithms run at full
+# speed.
+#
+# Work that runs in worker processes, such as the parallel starts of the Steiner tree approximation, is recorded in a
+# profile of the worker, whose phases, counters and events are merged into the profile of the parent process. The
+# cProfile and tracemalloc captures only cover the parent process.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import cProfile
+import io
+import json
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+PROFILE_HOOKS = ["cprofile", "tracemalloc"]
+NO_PHASE = nullcontext()
+
+active_profile = None  # the profile that is currently recorded, or None if profiling is off
+
+
+class Profile:
+    """ The phase timings, counters and optional cProfile/tracemalloc captures of one profiled run. """
+
+    def __init__(self, hooks: list = ()):
+        """
+        :param hooks: the additional captures to run, any of PROFILE_HOOKS
+        """
+        for hook in hooks:
+            if hook not in PROFILE_HOOKS:
+                raise ValueError("Unknown profile hook: " + str(hook))
+        self.hooks = list(hooks)
+        self.phases = {}  # the total wall time and number of calls, by phase name
+        self.counters = {}
+        self.max_counters = set()  # the counters that are set by record_max instead of increased by count
+        self.events = []  # (phase name, start time, duration) in the order the phases end
+        self.start_time = None
+        self.wall_time = None
+        self.profiler = None
+        self.memory = None
+
+    def start(self) -> None:
+        """ Starts recording, including the requested hooks """
+        if "tracemalloc" in self.hooks:
+            tracemalloc.start()
+        if "cprofile" in self.hooks:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        self.start_time = time.perf_counter()
+
+    def stop(self) -> None:
+        """ Stops recording, including the requested hooks """
+        self.wall_time = time.perf_counter() - self.start_time
+        if self.profiler is not None:
+            self.profiler.disable()
+        if "tracemalloc" in self.hooks:
+            snapshot = tracemalloc.take_snapshot()
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.memory = {"current_kb": current_memory // 1024, "peak_kb": peak_memory // 1024,
+                           "top_allocations": [{"location": str(statistic.traceback), "size_kb": statistic.size // 1024,
+                                                "count": statistic.count}
+                                               for statistic in snapshot.statistics("lineno")[:20]]}
+
+    def add_phase_time(self, name: str, start_time: float, duration: float) -> None:
+        """ Adds the duration of one call of the given phase """
+        total_time, nb_calls = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total_time + duration, nb_calls + 1)
+        self.events.append((name, start_time - self.start_time, duration))
+
+    def count(self, name: str, value: int = 1) -> None:
+        """ Increases the given counter by the given value """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_max(self, name: str, value: int) -> None:
+        """ Sets the given counter to the given value if it is larger than the current value """
+        self.counters[name] = max(self.counters.get(name, value), value)
+        self.max_counters.add(name)
+
+    def merge(self, profile: "Profile") -> None:
+        """ Adds the phase times, counters and events of the given profile, e.g. of a worker process """
+        for name, (total_time, nb_calls) in profile.phases.items():
+            own_total_time, own_nb_calls = self.phases.get(name, (0.0, 0))
+            self.phases[name] = (own_total_time + total_time, own_nb_calls + nb_calls)
+        for name, value in profile.counters.items():
+            if name in profile.max_counters:
+                self.record_max(name, value)
+            else:
+                self.count(name, value)
+        offset = profile.start_time - self.start_time  # perf_counter is system-wide
+        self.events.extend((name, start + offset, duration) for name, start, duration in profile.events)
+
+    def get_cprofile_statistics(self, nb_functions: int = 30) -> list:
+        """ Returns the functions with the largest cumulative time in the cProfile capture """
+        if self.profiler is None:
+            return []
+        statistics = pstats.Stats(self.profiler, stream=io.StringIO())
+        statistics.sort_stats("cumulative")
+        functions = []
+        for function in statistics.fcn_list[:nb_functions]:
+            nb_primitive_calls, nb_calls, total_time, cumulative_time, callers = statistics.stats[function]
+            functions.append({"function": "%s:%d(%s)" % function, "calls": nb_calls,
+                              "total_time": round(total_time, 6), "cumulative_time": round(cumulative_time, 6)})
+        return functions
+
+    def to_dict(self) -> dict:
+        """ Returns the profile as a JSON-serialisable dictionary """
+        profile = {"wall_time": None if self.wall_time is None else round(self.wall_time, 6),
+                   "phases": {name: {"time": round(total_time, 6), "calls": nb_calls}
+                              for name, (total_time, nb_calls) in self.phases.items()},
+                   "counters": dict(self.counters),
+                   "events": [{"phase": name, "start": round(start, 6), "duration": round(duration, 6)}
+                              for name, start, duration in self.events]}
+        if self.profiler is not None:
+            profile["cprofile"] = self.get_cprofile_statistics()
+        if self.memory is not None:
+            profile["tracemalloc"] = self.memory
+        return profile
+
+    def write(self, profile_file: str) -> None:
+        """ Writes the profile as JSON trace into the given file, and the cProfile capture next to it """
+        with open(profile_file, "w") as f:
+            json.dump(self.to_dict(), f, indent=1)
+        if self.profiler is not None:
+            self.profiler.dump_stats(get_cprofile_file(profile_file))
+
+
+class Phase:
+    """ Context manager that adds its wall time to a phase of the active profile """
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.profile.add_phase_time(self.name, self.start_time, time.perf_counter() - self.start_time)
+        return False
+
+
+def get_cprofile_file(profile_file: str) -> str:
+    """ Returns the file name of the cProfile capture that belongs to the given JSON trace """
+    return (profile_file[:-len(".json")] if profile_file.endswith(".json") else profile_file) + ".prof"
+
+
+def phase(name: str):
+    """ Returns a context manager that times the given phase, or a no-op context manager if profiling is off """
+    if active_profile is None:
+        return NO_PHASE
+    return Phase(active_profile, name)
+
+
+def start_profile(hooks: list = ()) -> Profile:
+    """ Starts profiling with the given hooks and returns the new active profile """
+    global active_profile
+    if active_profile is not None:
+        raise RuntimeError("A profile is already active")
+    active_profile = Profile(hooks)
+    active_profile.start()
+    return active_profile
+
+
+def stop_profile() -> Profile:
+    """ Stops profiling and returns the profile that was active """
+    global active_profile
+    profile = active_profile
+    active_profile = None
+    if profile is not None:
+        profile.stop()
+    return profile
+
+
+@contextmanager
+def profiled(hooks: list = ()):
+    """ Context manager that profiles its body and yields the profile, which is complete after the body """
+    profile = start_profile(hooks)
+    try:
+        yield profile
+    finally:
+        stop_profile()
@@ -0,0 +1,41 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Node-weighted Minimal Steiner Tree calculation
+#
+# Chooses between the exact dynamic program, which is fast for few terminals, and the greedy approximation, which
+# scales to many terminals.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import networkx as nx
+
+from exact_steiner_tree import exact_steiner_tree
+from steiner_tree_approximation import approximate_steiner_tree
+
+STEINER_TREE_MODES = ["auto", "exact", "approximate"]
+EXACT_MAX_TERMINALS = 5  # in mode "auto", the exact Steiner tree is calculated for up to this many terminals
+
+
+def calculate_steiner_tree(graph, terminals: list, seed: int, mode: str = "auto",
+                           exact_max_terminals: int = EXACT_MAX_TERMINALS, starts: int = 1, workers: int = 1,
+                           improve: bool = False) -> (nx.Graph, int):
+    """
+    Returns a node-weighted minimal Steiner tree, or an approximation of it.
+
+    :param graph: the underlying graph with weighted nodes with "cost" label, or a CorInstance
+    :param terminals: the terminals of the Steiner tree, which must be nodes in the given graph
+    :param seed: random number generator seed for the approximation
+    :param mode: "exact", "approximate", or "auto" to calculate the exact Steiner tree if there are at most
+    exact_max_terminals terminals, and an approximation otherwise
+    :param exact_max_terminals: the maximal number of terminals for the exact calculation in mode "auto"
+    :param starts: the number of starts of the approximation, see approximate_steiner_tree
+    :param workers: the number of worker processes that run the starts of the approximation
+    :param improve: whether to improve the approximation by local search
+    :return: the graph representing the Steiner tree and its node cost
+    """
+    if mode not in STEINER_TREE_MODES:
+        raise ValueError("Unknown Steiner tree mode: " + str(mode))
+    if mode == "exact" or (mode == "auto" and len(terminals) <= exact_max_terminals):
+        return exact_steiner_tree(graph, terminals)
+    return approximate_steiner_tree(graph, terminals, seed, starts, workers, improve)
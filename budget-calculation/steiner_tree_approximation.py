@@ -17,16 +17,35 @@
 #
 # 1. For each terminal t in Vt, create a single-node graph (a tree) and group these
 #    "terminal trees" in the tree list T.
-# 2. While |T| > 2:   (while the number of trees in the tree list is greater than 2)
-#    a. Calculate the minimal node-cost path p_ij between all trees in T, i.e. for each
-#       t_i, t_j in T, where i,j in 1..|T| and i < j. We say path p_ij has cost c_ij.
-#    b. Determine the two trees t_i, t_j in T with the smallest path cost c_ij
-#    c. Connect the trees t_i and t_j through their min cost path p_ij and merge them
+# 2. While |T| > 1:   (while the number of trees in the tree list is greater than 1)
+#    a. Determine the two trees t_i, t_j in T with the smallest minimal node-cost path
+#       p_ij between them
+#    b. Connect the trees t_i and t_j through their min cost path p_ij and merge them
 #       into tree t'
-#    d. Remove t_i and t_j from T and add the merged tree t' to T
-# 3. Calculate the minimal node cost path between the two remaining trees in T
-# 4. Connect the remaining two trees in T through their min cost path which yields a
-#    Steiner tree approximation
+#    c. Remove t_i and t_j from T and add the merged tree t' to T
+#
+# The minimal node-cost paths between the trees are kept in a priority queue. Initially,
+# one search from each terminal yields the paths to all other terminals. After merging
+# two trees, only the paths from the new merged tree are computed, using one search that
+# starts from all nodes of the merged tree at once.
+#
+# The trees are kept in a disjoint-set (union-find) structure over the node ids of the
+# graph. The nodes of a tree have zero cost for the path search, so each tree acts as
+# one supernode, without copying or modifying the graph itself.
+#
+# ------ Multi-start: ---------------------------------------------------------------
+#
+# The greedy heuristic can be run from several starts, each in a worker process that
+# shares the read-only graph. The first start is the deterministic greedy pass. The other
+# starts are randomized by the seed: the node costs for the path search are perturbed by
+# a random factor, which changes the tie-breaking, the merge order and the closest node
+# of each tree, and the terminals are shuffled. The cheapest tree (with respect to the
+# original node costs) of all starts is returned.
+#
+# Optionally, each tree is improved by local search: non-terminal leaves are pruned, and
+# each key path (a path between terminals or branching nodes whose inner nodes have
+# degree 2) is exchanged for the cheapest path that reconnects the two parts of the tree,
+# if that path is cheaper.
 #
 # This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
 # See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
@@ -35,157 +54,367 @@
 # ---------------------------------------------------------------------------------------------------------------------
 
 import random
+from array import array
+from heapq import heappop, heappush
+from multiprocessing import Pool
 
 import networkx as nx
 
-from min_cost_path_calculation import calculate_min_cost_path
+import profiling
+from disjoint_set import DisjointSet
+from instance_reader import CorInstance, copy_instance_arrays
+from min_cost_path_calculation import get_search_structure, node_weighted_dijkstra, extract_path
+
+COST_PERTURBATION = 1.0  # the maximal relative perturbation of the node costs in randomized starts
+worker_search_structure = None  # the graph and terminals shared by the starts in a worker process
+
+
+class TreeForest:
+    """
+    The trees of the greedy heuristic, kept as disjoint sets over the node ids of the underlying graph. Every tree has
+    an id; merging two trees yields a tree with a new id, so that paths to the merged trees can be recognised as
+    outdated.
+    """
+
+    def __init__(self, nb_nodes: int, cost, terminals: list):
+        """
+        Create a tree for each terminal.
+
+        :param nb_nodes: upper bound on the node ids of the underlying graph
+        :param cost: the node costs of the underlying graph, indexed by node
+        :param terminals: the terminals of the Steiner tree
+        """
+        self.components = DisjointSet(nb_nodes)
+        self.in_tree = bytearray(nb_nodes)
+        self.cost = array("d", cost)  # node costs for the path search, where the tree nodes are free
+        self.members = {}  # the nodes of each tree, by tree id
+        self.tree_id_of_root = {}  # the tree id of each disjoint-set representative
+        self.edges = []  # the edges of all trees
+        for terminal in terminals:
+            self.in_tree[terminal] = 1
+            self.cost[terminal] = 0
+            self.members[len(self.members)] = [terminal]
+            self.tree_id_of_root[terminal] = len(self.tree_id_of_root)
+        self.next_tree_id = len(self.members)
+
+    def tree_of(self, node: int) -> int:
+        """ Returns the id of the tree that contains the given node (which must be a tree node). """
+        return self.tree_id_of_root[self.components.find(node)]
+
+    def nodes_of_other_trees(self, tree_id: int) -> "NodesOfOtherTrees":
+        """ Returns the collection of all tree nodes that are not in the given tree """
+        return NodesOfOtherTrees(self, self.components.find(self.members[tree_id][0]))
+
+    def merge_along_path(self, tree_id1: int, tree_id2: int, path: list) -> int:
+        """
+        Merge the given two trees into one tree by using the given path between the two trees. The nodes on the path
+        become tree nodes and have zero cost for future path searches.
+
+        :param tree_id1: the first tree to merge
+        :param tree_id2: the second tree to merge
+        :param path: the path from a node of tree1 to a node of tree2 through which the trees are to be merged
+        :return: the id of the merged tree
+        """
+        del self.tree_id_of_root[self.components.find(path[0])]
+        del self.tree_id_of_root[self.components.find(path[-1])]
+        merged_members = self.members.pop(tree_id1) + self.members.pop(tree_id2)
+        for i in range(1, len(path)):
+            node = path[i]
+            if not self.in_tree[node]:
+                self.in_tree[node] = 1
+                self.cost[node] = 0
+                merged_members.append(node)
+            self.components.union(path[i - 1], node)
+            self.edges.append((path[i - 1], node))
+        tree_id = self.next_tree_id
+        self.next_tree_id = self.next_tree_id + 1
+        self.members[tree_id] = merged_members
+        self.tree_id_of_root[self.components.find(path[0])] = tree_id
+        return tree_id
+
+
+class NodesOfOtherTrees:
+    """ Read-only collection of the tree nodes that are not in the tree with the given representative. """
 
+    def __init__(self, forest: TreeForest, root: int):
+        self.forest = forest
+        self.root = root
 
-def initialise_trees(terminals: list) -> list:
+    def __contains__(self, node: int) -> bool:
+        return self.forest.in_tree[node] == 1 and self.forest.components.find(node) != self.root
+
+
+def push_paths_from_tree(tree_id: int, forest: TreeForest, nb_nodes: int, neighbours: callable, queue: list) -> None:
+    """
+    Calculates the minimal node-cost paths from the given tree to all other trees with one search that starts from all
+    nodes of the tree, and pushes them onto the priority queue. The search does not pass through other trees, which
+    means that every path connects exactly two trees.
+
+    :param tree_id: the id of the tree from which the paths are calculated
+    :param forest: the current trees
+    :param nb_nodes: upper bound on the node ids of the underlying graph
+    :param neighbours: function that returns the neighbours of a node in the underlying graph
+    :param queue: the priority queue of (cost, tree id, tree id, path) entries
+    """
+    distance, predecessor = node_weighted_dijkstra(nb_nodes, neighbours, forest.cost, forest.members[tree_id],
+                                                   sinks=forest.nodes_of_other_trees(tree_id))
+    for other_id, other_members in forest.members.items():
+        if other_id == tree_id:
+            continue
+        closest_node = min(other_members, key=lambda node: distance[node])  # the closest node of the other tree
+        if distance[closest_node] < float("inf"):
+            path = extract_path(predecessor, closest_node)
+            heappush(queue, (distance[closest_node], min(tree_id, other_id), max(tree_id, other_id), path))
+
+
+def generate_approx_steiner_tree(forest: TreeForest, nb_nodes: int, neighbours: callable) -> None:
+    """
+    Greedily connects the closest terminals by combining them into trees, until the forest consists of a single tree,
+    the minimal Steiner tree approximation that connects all terminals.
+
+    :param forest: the terminals, each represented as a tree
+    :param nb_nodes: upper bound on the node ids of the underlying graph
+    :param neighbours: function that returns the neighbours of a node in the underlying graph
     """
-    Create a tree for each terminal and return a list of pairs: the tree graph paired with the terminal.
+    profile = profiling.active_profile
+    queue = []
+    for tree_id in list(forest.members.keys()):
+        push_paths_from_tree(tree_id, forest, nb_nodes, neighbours, queue)
+    if profile is not None:
+        profile.record_max("peak_tree_count", len(forest.members))
+    while len(forest.members) > 1:
+        if not queue:
+            raise nx.NetworkXNoPath("The terminals are not connected.")
+        cost, tree_id1, tree_id2, path = heappop(queue)
+        if tree_id1 not in forest.members or tree_id2 not in forest.members:
+            if profile is not None:
+                profile.count("outdated_paths_skipped")
+            continue  # at least one of the trees has already been merged
+        if any(forest.in_tree[node] for node in path[1:-1]):
+            # the path crosses a tree that was merged after the path was calculated, so recalculate the paths
+            if profile is not None:
+                profile.count("path_recalculations")
+            push_paths_from_tree(tree_id1, forest, nb_nodes, neighbours, queue)
+            continue
+        merged_tree_id = forest.merge_along_path(tree_id1, tree_id2, path)
+        push_paths_from_tree(merged_tree_id, forest, nb_nodes, neighbours, queue)
+        if profile is not None:
+            profile.count("merges")
+            profile.record_max("peak_queue_length", len(queue))
+
+
+def create_steiner_tree_graph(nodes: list, edges: list, cost) -> (nx.Graph, int):
+    """ Returns the graph of the Steiner tree with the given nodes and edges, with 'cost' labels, and its node cost. """
+    if profiling.active_profile is not None:
+        profiling.active_profile.count("graphs_built")
+    steiner_tree = nx.Graph()
+    steiner_tree.add_nodes_from((node, {"cost": cost[node]}) for node in nodes)
+    steiner_tree.add_edges_from(edges)
+    return steiner_tree, sum(cost[node] for node in nodes)
+
+
+def prune_non_terminal_leaves(tree: dict, terminals: set) -> None:
+    """
+    Repeatedly removes the non-terminal leaves from the given tree.
+
+    :param tree: the neighbours of each node in the tree, as sets
+    :param terminals: the terminals, which are never removed
+    """
+    leaves = [node for node, tree_neighbours in tree.items() if len(tree_neighbours) <= 1 and node not in terminals]
+    while leaves:
+        node = leaves.pop()
+        if node not in tree:
+            continue
+        for neighbour in tree.pop(node):
+            tree[neighbour].discard(node)
+            if len(tree[neighbour]) <= 1 and neighbour not in terminals:
+                leaves.append(neighbour)
+
+
+def find_key_paths(tree: dict, terminals: set) -> list:
+    """
+    Returns the key paths of the given tree, i.e. the paths between key nodes (terminals and nodes of degree other than
+    2) whose inner nodes are not key nodes. Only key paths with inner nodes are returned.
+    """
+    key_paths = []
+    for key_node, key_neighbours in tree.items():
+        if len(key_neighbours) == 2 and key_node not in terminals:
+            continue
+        for neighbour in key_neighbours:
+            path = [key_node, neighbour]
+            while len(tree[path[-1]]) == 2 and path[-1] not in terminals:
+                path.append(next(node for node in tree[path[-1]] if node != path[-2]))
+            if len(path) > 2 and (path[0], path[1]) < (path[-1], path[-2]):  # each key path only once
+                key_paths.append(path)
+    return key_paths
+
+
+def exchange_key_path(tree: dict, key_path: list, nb_nodes: int, neighbours: callable, cost) -> bool:
+    """
+    Exchanges the given key path of the tree for the cheapest path that reconnects the two parts of the tree without
+    the inner nodes of the key path, if that path is cheaper.
+
+    :param tree: the neighbours of each node in the tree, as sets, which is modified in place
+    :param key_path: the key path to exchange
+    :param nb_nodes: upper bound on the node ids of the underlying graph
+    :param neighbours: function that returns the neighbours of a node in the underlying graph
+    :param cost: the node costs of the underlying graph, indexed by node
+    :return: whether the key path was exchanged
+    """
+    inner_nodes = set(key_path[1:-1])
+    part = {key_path[0]}  # the part of the tree that contains the first end of the key path
+    stack = [key_path[0]]
+    while stack:
+        for neighbour in tree[stack.pop()]:
+            if neighbour not in part and neighbour not in inner_nodes:
+                part.add(neighbour)
+                stack.append(neighbour)
+    other_part = set(tree.keys()) - part - inner_nodes
+    distance, predecessor = node_weighted_dijkstra(nb_nodes, neighbours, cost, list(part), sinks=other_part)
+    closest_node = min(other_part, key=lambda node: distance[node] - cost[node])
+    if distance[closest_node] - cost[closest_node] >= sum(cost[node] for node in inner_nodes):
+        return False
+    for node in inner_nodes:
+        for neighbour in tree.pop(node):
+            if neighbour in tree:
+                tree[neighbour].discard(node)
+    path = extract_path(predecessor, closest_node)
+    for i in range(1, len(path)):
+        tree.setdefault(path[i - 1], set()).add(path[i])
+        tree.setdefault(path[i], set()).add(path[i - 1])
+    return True
+
+
+def improve_steiner_tree(nodes: list, edges: list, nb_nodes: int, neighbours: callable, cost,
+                         terminals: list) -> (list, list):
+    """
+    Improves the given Steiner tree by pruning non-terminal leaves and exchanging key paths for cheaper paths, until
+    no key path can be exchanged any more.
+
+    :return: the nodes and edges of the improved tree
+    """
+    tree = {node: set() for node in nodes}
+    for node1, node2 in edges:
+        tree[node1].add(node2)
+        tree[node2].add(node1)
+    terminals = set(terminals)
+    prune_non_terminal_leaves(tree, terminals)
+    improved = True
+    while improved:
+        improved = False
+        for key_path in find_key_paths(tree, terminals):
+            if exchange_key_path(tree, key_path, nb_nodes, neighbours, cost):
+                prune_non_terminal_leaves(tree, terminals)
+                improved = True
+                break  # the key paths have changed
+    return sorted(tree.keys()), [(node1, node2) for node1 in tree for node2 in tree[node1] if node1 < node2]
+
+
+def perturb_costs(cost, perturbation: float, rng: random.Random) -> array:
+    """ Returns the node costs, each multiplied by a random factor between 1 and 1 + perturbation """
+    return array("d", (node_cost * (1 + perturbation * rng.random()) for node_cost in cost))
+
+
+def calculate_approx_steiner_tree(nb_nodes: int, neighbours: callable, cost, terminals: list, seed: int = None,
+                                  improve: bool = False) -> (list, list, int):
+    """
+    Calculates one approximate node-weighted minimal Steiner tree with the greedy heuristic.
+
+    :param nb_nodes: upper bound on the node ids of the underlying graph
+    :param neighbours: function that returns the neighbours of a node in the underlying graph
+    :param cost: the node costs of the underlying graph, indexed by node
     :param terminals: the terminals of the Steiner tree
-    :return: a list of graphs paired with the terminal the graph represents
-    """
-    trees = []
-    for terminal in terminals:
-        tree = nx.Graph()
-        tree.add_node(terminal)
-        trees.append((tree, terminal))
-    return trees
-
-
-def copy_and_initialise_main_graph(graph: nx.graph, terminals: list) -> nx.graph:
-    """ Create a copy of the given graph which we will use to calculate the Steiner tree. """
-    copied_graph = graph.copy()
-    # set the node costs of the terminals to zero
-    for terminal in terminals:
-        copied_graph.nodes()[terminal]['cost'] = 0
-    return copied_graph
-
-
-def pick_random_node(tree: nx.Graph) -> int:
-    """ Picks a random node from the given graph and returns it. """
-    size = tree.size()
-    return tree.nodes()[random.randint(0, size - 1)]
-
-
-def merge_two_trees(tree_pair1: (nx.Graph, int), tree_pair2: (nx.Graph, int), path: list, main_graph: nx.Graph) -> (
-        nx.Graph, int):
-    """
-    Merge the given two trees into one tree by using the given path between the two trees. The merged tree is returned.
-    Note that the nodes of the two trees are contracted into one node in the main_graph. This is done to facilitate
-    calculating the min cost paths between other trees in the future.
-
-    :param tree_pair1: the first tree to merge, consisting of the tree graph and the terminal it represents
-    :param tree_pair2: the second tree to merge, consisting of the tree graph and the terminal it represents
-    :param path: the path from tree1 to tree2 through which the trees are to be merged
-    :param main_graph: the underlying graph (containing both trees) is used to obtain node costs
-    :return: the tree resulting when merging tree1 with tree2 via the given path, and the terminal it represents
-    """
-    costs = nx.get_node_attributes(main_graph, 'cost')
-    tree1 = tree_pair1[0]
-    tree2 = tree_pair2[0]
-    # draw_trees_to_merge(tree1, tree2, path, main_graph)
-    # first add the path to tree1
-    prev_node = -1
-    union_edge = None  # this is the edge that joins the connecting path with tree2
-    for node in path:
-        if tree2.has_node(node):
-            union_edge = (prev_node, node)
-            break  # the nodes of tree2 will be added when applying the union of the two trees
-        if not tree1.has_node(node):
-            tree1.add_node(node, cost=costs[node])
-            if prev_node >= 0:
-                if not tree1.has_edge(prev_node, node):
-                    tree1.add_edge(prev_node, node)
-                    # contract the newly added nodes in the tree
-                    main_graph = nx.contracted_nodes(main_graph, prev_node, node, self_loops=False)
-        prev_node = node
-    # contract all nodes of tree2 in the main graph
-    for node in tree2.nodes():
-        main_graph = nx.contracted_nodes(main_graph, prev_node, node, self_loops=False)
-        prev_node = node
-    # join tree1 with tree2 (which should be disjoint, and connected with "union_edge")
-    # draw_trees_to_merge(tree1, tree2, path, main_graph) # DEBUG
-    merged_tree = nx.union(tree1, tree2)
-    merged_tree.add_edge(union_edge[0], union_edge[1])
-    # draw_merged_tree(merged_tree, main_graph) # DEBUG
-    # associate the merged tree with the terminal of the first tree
-    return merged_tree, tree_pair1[1]
-
-
-def connect_closest_two_trees(trees: list, main_graph: nx.graph) -> list:
-    """
-    Connects the two closest trees in the given tree list, and replaces the connected trees in the list with the new
-    merged tree.
-
-    :param trees: list of trees, where each element is a pair of the tree graph and the terminal it represents
-    :param main_graph: the underlying graph that is used to calculate the minimal node-cost path
-    :return: the updated list of trees where the connected trees are replaced by the connected tree representing them
-    """
-    # FIXME: improve performance by only computing paths to "new" trees
-    min_cost = float("inf")
-    min_cost_path = []
-    best_tree_pair = None
-    nb_trees = len(trees)
-    for i in range(0, nb_trees - 2):
-        for j in range(i + 1, nb_trees - 1):
-            path, cost = calculate_min_cost_path(trees[i][1], trees[j][1], main_graph)
-            if cost < min_cost:
-                min_cost = cost
-                min_cost_path = path
-                best_tree_pair = (i, j)
-    index_tree1 = best_tree_pair[0]  # the indices of the two trees to be merged
-    index_tree2 = best_tree_pair[1]
-    new_tree = merge_two_trees(trees[index_tree1], trees[index_tree2], min_cost_path, main_graph)
-    trees.remove(trees[index_tree2])  # first remove the higher indexed tree -> j > i
-    trees.remove(trees[index_tree1])
-    trees.append(new_tree)
-    return trees
-
-
-def connect_last_two_trees(tree_pair1: (nx.Graph, int), tree_pair2: (nx.Graph, int), main_graph: nx.Graph) -> nx.Graph:
-    path, cost = calculate_min_cost_path(tree_pair1[1], tree_pair2[1], main_graph)
-    return (merge_two_trees(tree_pair1, tree_pair2, path, main_graph))[0]
-
-
-def generate_approx_steiner_tree(trees: list, main_graph: nx.Graph) -> nx.Graph:
-    """
-    Greedily connects the closest terminals by combining them into trees, forming a minimal Steiner tree approximation.
-
-    :param trees: the list of terminals, each represented as a tree graph
-    :param main_graph: the underlying graph used to calculate the min node cost path
-    :return: the approximate minimal Steiner tree that connects all terminals
-    """
-    while len(trees) > 2:
-        trees = connect_closest_two_trees(trees, main_graph)
-    return connect_last_two_trees(trees[0], trees[1], main_graph)
-
-
-def calculate_steiner_tree_costs(steiner_tree: nx.Graph, main_graph: nx.Graph) -> int:
-    costs = nx.get_node_attributes(main_graph, 'cost')
-    cost = 0
-    for node in list(steiner_tree.nodes()):
-        cost = cost + costs[node]
-    return cost
-
-
-def approximate_steiner_tree(graph: nx.Graph, terminals: list, seed: int) -> (nx.Graph, int):
+    :param seed: the seed for the randomization of the path search costs and the terminal order, or None for the
+    deterministic greedy heuristic
+    :param improve: whether to improve the tree by local search
+    :return: the nodes and edges of the tree, and its node cost
+    """
+    search_cost = cost
+    if seed is not None:
+        rng = random.Random(seed)
+        terminals = list(terminals)
+        rng.shuffle(terminals)
+        search_cost = perturb_costs(cost, COST_PERTURBATION, rng)
+    forest = TreeForest(nb_nodes, search_cost, terminals)
+    generate_approx_steiner_tree(forest, nb_nodes, neighbours)
+    nodes, edges = next(iter(forest.members.values())), forest.edges
+    if improve:
+        nodes, edges = improve_steiner_tree(nodes, edges, nb_nodes, neighbours, cost, terminals)
+    return nodes, edges, sum(cost[node] for node in nodes)
+
+
+def init_start_worker(nb_nodes: int, neighbours: callable, cost, terminals: list, improve: bool,
+                      profile: bool) -> None:
+    """
+    Initialises a worker process with the read-only graph and terminals that all its starts share, and whether the
+    starts are profiled
+    """
+    global worker_search_structure
+    worker_search_structure = (nb_nodes, neighbours, cost, terminals, improve, profile)
+
+
+def run_start(seed: int) -> ((list, list, int), profiling.Profile):
+    """
+    Runs one start of the greedy heuristic in a worker process, see calculate_approx_steiner_tree.
+
+    :return: the result of the start, and its profile if the starts are profiled, otherwise None
+    """
+    nb_nodes, neighbours, cost, terminals, improve, profile = worker_search_structure
+    if not profile:
+        return calculate_approx_steiner_tree(nb_nodes, neighbours, cost, terminals, seed, improve), None
+    profiling.active_profile = None  # a forked worker process starts with a copy of the profile of the parent
+    with profiling.profiled() as worker_profile:
+        result = calculate_approx_steiner_tree(nb_nodes, neighbours, cost, terminals, seed, improve)
+    return result, worker_profile
+
+
+def multi_start_steiner_tree(nb_nodes: int, neighbours: callable, cost, terminals: list, seed: int, starts: int = 1,
+                             workers: int = 1, improve: bool = False) -> (list, list, int):
+    """
+    Runs the greedy heuristic from several starts, in parallel if there are several workers, and returns the cheapest
+    tree. The first start is the deterministic greedy heuristic, the seeds of the other starts are drawn from the
+    given seed. If profiling is on, the profiles of the starts in the worker processes are merged into the active
+    profile.
+
+    :return: the nodes and edges of the cheapest tree, and its node cost
+    """
+    rng = random.Random(seed)
+    seeds = [None] + [rng.randrange(2 ** 32) for start in range(1, starts)]
+    if workers <= 1 or starts <= 1:
+        results = [calculate_approx_steiner_tree(nb_nodes, neighbours, cost, terminals, start_seed, improve)
+                   for start_seed in seeds]
+    else:
+        profile = profiling.active_profile
+        with Pool(processes=min(workers, starts), initializer=init_start_worker,
+                  initargs=(nb_nodes, neighbours, cost, terminals, improve, profile is not None)) as pool:
+            results = []
+            for result, worker_profile in pool.map(run_start, seeds):
+                results.append(result)
+                if profile is not None:
+                    profile.merge(worker_profile)
+                    profile.count("worker_starts")
+    return min(results, key=lambda result: result[2])  # the first cheapest tree, independent of the worker timing
+
+
+def approximate_steiner_tree(graph, terminals: list, seed: int, starts: int = 1, workers: int = 1,
+                             improve: bool = False) -> (nx.Graph, int):
     """
     Returns an approximate node-weighted minimal Steiner tree using a greedy heuristic.
 
-    :param graph: the underlying graph with weighted nodes with "cost" label
+    :param graph: the underlying graph with weighted nodes with "cost" label, or a CorInstance
     :param terminals: the terminals of the Steiner tree, which must be nodes in the given graph
-    :param seed: random number generator seed
+    :param seed: random number generator seed for the randomized starts
+    :param starts: the number of starts, where the first start is the deterministic greedy heuristic
+    :param workers: the number of worker processes that run the starts
+    :param improve: whether to improve each tree by local search
     :return: the graph representing the Steiner tree and its node cost
     """
-    trees = initialise_trees(terminals)
-    graph_copy = copy_and_initialise_main_graph(graph,
-                                                terminals)  # we will modify the copied graph
-    random.seed(seed)
-    steiner_tree = generate_approx_steiner_tree(trees, graph_copy)
-    cost = calculate_steiner_tree_costs(steiner_tree, graph)
+    if isinstance(graph, CorInstance) and workers > 1 and starts > 1:
+        graph = copy_instance_arrays(graph)  # the worker processes get the instance pickled
+    nb_nodes, neighbours, cost = get_search_structure(graph)
+    nodes, edges, steiner_tree_cost = multi_start_steiner_tree(nb_nodes, neighbours, cost, terminals, seed, starts,
+                                                               workers, improve)
+    steiner_tree, cost = create_steiner_tree_graph(nodes, edges, cost)
     print("Calculated approximated minimal node-weighted steiner tree with cost: " + str(cost))
     # draw_steiner_tree_in_graph(graph, steiner_tree) # DEBUG
     return steiner_tree, cost
@@ -0,0 +1,294 @@
+# ---------------------------------------------------------------------------------------------------------------------
+# Verifies instances with budget constants and their helper files
+#
+# Checks the files in the given directories (recursively), in parallel worker processes:
+#
+#  - instances with a budget constant ('b' line): the budget must be the recalculated lower bound for the budget plus
+#    the budget percentage stated in the comment of the instance, or at least the lower bound if there is no comment.
+#    With --min-budget, the budget only has to be at least the lower bound plus the stated percentage, which accepts
+#    budgets that were calculated from a more expensive Steiner tree, like those of the artificial instances
+#  - solutions (.minsteiner files and .sol files of the max-profit heuristic): the parcels must be connected, contain
+#    every reserve, and have the cost and utility stated in the first line of the file; the cost of a .sol file must
+#    be within the budget of its instance
+#  - .dist3 files: every non-reserve node that is connected to the reserves must be listed, and its value must lie
+#    between the cost L of the minimal Steiner tree of the reserves and L plus the cost of the cheapest path from the
+#    tree to the node (exactly L for the nodes of the tree); a few randomly chosen values are recalculated exactly
+#
+# A helper file belongs to the instance with the same name (e.g. my_instance.sol to my_instance.cor), or otherwise to
+# the instance without budget (.cor.orig or .cor.original) in the same directory. Connectivity is checked with a
+# breadth-first search over the neighbour arrays of the instance, without building a graph.
+#
+# This file is part of the wildlife_corridor_design_instances repository which is released under the MIT license.
+# See file at https://github.com/angee/wildlife_corridor_design_instances/blob/master/LICENSE for full license details.
+# ---------------------------------------------------------------------------------------------------------------------
+
+import contextlib
+import glob
+import io
+import os
+import random
+import sys
+from argparse import ArgumentParser
+from array import array
+from multiprocessing import Pool
+
+from batch_budget_calculation import collect_instance_files
+from budget_calculation import calculate_budget, read_budget_percentage, get_default_output_file
+from dist3_calculation import read_dist3_file
+from instance_reader import read_instance, CorInstance, is_instance_file_name
+from min_cost_path_calculation import node_weighted_dijkstra
+from steiner_tree import calculate_steiner_tree, STEINER_TREE_MODES
+
+SOLUTION_EXTENSIONS = [".minsteiner", ".sol"]
+MAX_REPORTED_ERRORS = 10  # the maximal number of errors reported per file
+
+
+def parse_args():
+    """
+    Parsing the command line arguments
+    :return:
+    """
+    parser = ArgumentParser(description="Wildlife corridor design verification of instances, solutions and .dist3 "
+                                        "files")
+    parser.add_argument("paths", nargs="*", default=["../instances"],
+                        help="directories (searched recursively), glob patterns or files to verify (default: "
+                             "../instances)")
+    parser.add_argument("-w", dest="workers", required=False, default=os.cpu_count(), type=int,
+                        help="the number of worker processes (default: number of CPUs)")
+    parser.add_argument("-s", dest="seed", required=False, default=11, type=int,
+                        help="the seed for the steiner tree approximation algorithm and the .dist3 samples")
+    parser.add_argument("-m", dest="mode", required=False, default="auto", choices=STEINER_TREE_MODES,
+                        help="the steiner tree calculation for the lower bound of the budget (default auto)")
+    parser.add_argument("--dist3-samples", dest="dist3_samples", required=False, default=3, type=int,
+                        help="the number of .dist3 values per file that are recalculated exactly (default 3)")
+    parser.add_argument("--min-budget", dest="min_budget", action="store_true",
+                        help="only check that each budget is at least the lower bound plus the stated percentage, "
+                             "e.g. for budgets that were calculated from a more expensive steiner tree")
+    return parser.parse_args()
+
+
+def read_solution_file(solution_file: str) -> (int, int, list):
+    """ Reads a solution in the format of the .minsteiner files and returns its cost, utility and parcels """
+    with open(solution_file) as f:
+        cost, utility = (int(value) for value in f.readline().split()[:2])
+        nodes = [int(node) for node in f.read().split()]
+    return cost, utility, nodes
+
+
+def is_connected(instance: CorInstance, nodes: list) -> bool:
+    """ Checks with a breadth-first search whether the given nodes induce a connected subgraph of the instance """
+    if len(nodes) == 0:
+        return True
+    in_set = bytearray(instance.nb_nodes)
+    for node in nodes:
+        in_set[node] = 1
+    queue = array("q", [nodes[0]])
+    in_set[nodes[0]] = 2  # visited
+    next_index = 0
+    while next_index < len(queue):
+        for neighbour in instance.neighbours(queue[next_index]):
+            if in_set[neighbour] == 1:
+                in_set[neighbour] = 2
+                queue.append(neighbour)
+        next_index = next_index + 1
+    return len(queue) == len(set(nodes))
+
+
+def verify_solution(instance: CorInstance, nodes: list, cost: int = None, utility: int = None,
+                    budget: int = None) -> list:
+    """
+    Verifies that the given parcels form a corridor of the instance.
+
+    :param instance: the instance
+    :param nodes: the parcels of the corridor
+    :param cost: if given, the stated cost of the corridor
+    :param utility: if given, the stated utility of the corridor
+    :param budget: if given, the budget that the cost of the corridor must not exceed
+    :return: the error messages, empty if the corridor is valid
+    """
+    unknown_nodes = [node for node in nodes if not 0 <= node < instance.nb_nodes]
+    if unknown_nodes:
+        return ["unknown parcels " + " ".join(map(str, unknown_nodes[:MAX_REPORTED_ERRORS]))]
+    errors = []
+    if len(set(nodes)) != len(nodes):
+        errors.append("parcels are listed more than once")
+    nodes = sorted(set(nodes))
+    if not is_connected(instance, nodes):
+        errors.append("the parcels are not connected")
+    in_corridor = set(nodes)
+    missing_reserves = [reserve for reserve in instance.reserves() if reserve not in in_corridor]
+    if missing_reserves:
+        errors.append("missing reserves " + " ".join(map(str, missing_reserves[:MAX_REPORTED_ERRORS])))
+    total_cost = sum(instance.cost[node] for node in nodes)
+    total_utility = sum(instance.profit[node] for node in nodes)
+    if cost is not None and cost != total_cost:
+        errors.append("stated cost " + str(cost) + ", but the parcels cost " + str(total_cost))
+    if utility is not None and utility != total_utility:
+        errors.append("stated utility " + str(utility) + ", but the parcels have utility " + str(total_utility))
+    if budget is not None and total_cost > budget:
+        errors.append("the cost " + str(total_cost) + " exceeds the budget " + str(budget))
+    return errors
+
+
+def verify_budget(instance_file: str, instance: CorInstance, seed: int, mode: str = "auto",
+                  min_budget: bool = False) -> list:
+    """
+    Verifies the budget constant of the instance against the recalculated lower bound for the budget plus the budget
+    percentage stated in the instance file.
+
+    :param min_budget: if True, a budget above the lower bound plus the percentage is accepted as well
+    :return: the error messages, empty if the budget is correct
+    """
+    reserves = instance.reserves()
+    steiner_tree, lower_bound = calculate_steiner_tree(instance, reserves, seed, mode)
+    percentage = read_budget_percentage(instance_file)
+    if percentage is None:
+        if instance.budget < lower_bound:
+            return ["the budget " + str(instance.budget) + " is smaller than the lower bound " + str(lower_bound)]
+        return []
+    expected_budget = calculate_budget(lower_bound, percentage)
+    if min_budget:
+        if instance.budget <= lower_bound * (1 + percentage) - 1:  # older budgets are rounded down
+            return ["the budget is " + str(instance.budget) + ", but the lower bound " + str(lower_bound) + " plus " +
+                    str(round(percentage * 100, 2)) + "% is at least " + str(expected_budget)]
+        return []
+    if abs(instance.budget - lower_bound * (1 + percentage)) >= 1:  # older budgets are rounded down
+        return ["the budget is " + str(instance.budget) + ", but the lower bound " + str(lower_bound) + " plus " +
+                str(round(percentage * 100, 2)) + "% is " + str(expected_budget)]
+    return []
+
+
+def verify_dist3(instance: CorInstance, dist3_file: str, nb_samples: int, seed: int) -> list:
+    """
+    Verifies the .dist3 file of the instance: the listed nodes, bounds for all values, and exact values for a sample.
+
+    :param instance: the instance
+    :param dist3_file: the .dist3 file
+    :param nb_samples: the number of values that are recalculated exactly
+    :param seed: the seed for choosing the sample
+    :return: the error messages, empty if no error was found
+    """
+    errors = []
+    dist3 = read_dist3_file(dist3_file)
+    reserves = instance.reserves()
+    steiner_tree, lower_bound = calculate_steiner_tree(instance, reserves, seed, "exact")
+    distance, predecessor = node_weighted_dijkstra(instance.nb_nodes, instance.neighbours, instance.cost,
+                                                   list(steiner_tree.nodes()))
+    checked_nodes = []
+    for node, value in sorted(dist3.items()):
+        if not 0 <= node < instance.nb_nodes or instance.is_reserve[node]:
+            errors.append("node " + str(node) + " is listed, but is not a parcel of the instance")
+        elif distance[node] == float("inf"):
+            errors.append("node " + str(node) + " is listed, but is not connected to the reserves")
+        elif not lower_bound <= value <= lower_bound + distance[node]:
+            errors.append("node " + str(node) + " has value " + str(value) + " outside of [" + str(lower_bound) +
+                          ", " + str(int(lower_bound + distance[node])) + "]")
+        else:
+            checked_nodes.append(node)
+    missing_nodes = [node for node in range(0, instance.nb_nodes)
+                     if not instance.is_reserve[node] and distance[node] < float("inf") and node not in dist3]
+    if missing_nodes:
+        errors.append(str(len(missing_nodes)) + " nodes connected to the reserves are missing, e.g. node " +
+                      str(missing_nodes[0]))
+    for node in random.Random(seed).sample(checked_nodes, min(nb_samples, len(checked_nodes))):
+        steiner_tree, expected = calculate_steiner_tree(instance, reserves + [node], seed, "exact")
+        if dist3[node] != expected:
+            errors.append("node " + str(node) + " has value " + str(dist3[node]) + ", but calculated " +
+                          str(expected))
+    return errors
+
+
+def get_helper_instance_file(helper_file: str):
+    """
+    Returns the instance file of the given solution or .dist3 file: the instance with the same name, or otherwise the
+    instance without budget in the same directory, or None if there is none.
+    """
+    base_name = os.path.splitext(helper_file)[0]
+    instance_files = sorted(file for file in glob.glob(glob.escape(base_name) + ".cor*")
+                            if is_instance_file_name(file) and get_default_output_file(file, "") == base_name)
+    if instance_files:
+        return instance_files[0]
+    directory = os.path.dirname(helper_file)
+    instance_files = sorted(glob.glob(os.path.join(directory, "*.cor.orig")) +
+                            glob.glob(os.path.join(directory, "*.cor.original")))
+    return instance_files[0] if len(instance_files) == 1 else None
+
+
+def collect_helper_files(paths: list) -> list:
+    """ Collects the solution and .dist3 files from the given directories, glob patterns and files """
+    files = set()
+    for path in paths:
+        if os.path.isdir(path):
+            for extension in SOLUTION_EXTENSIONS + [".dist3"]:
+                files.update(glob.glob(os.path.join(path, "**", "*" + extension), recursive=True))
+        else:
+            files.update(file for file in glob.glob(path, recursive=True)
+                         if os.path.isfile(file) and os.path.splitext(file)[1] in SOLUTION_EXTENSIONS + [".dist3"])
+    return sorted(files)
+
+
+def verify_file(task: tuple) -> (str, list):
+    """
+    Verifies one instance, solution or .dist3 file. Runs in a worker process; any error is reported in the result
+    instead of being raised, and the output of the Steiner tree calculations is suppressed.
+
+    :param task: the file, the seed, the Steiner tree mode, the number of .dist3 samples and the min budget option
+    :return: the file and its error messages
+    """
+    file, seed, mode, dist3_samples, min_budget = task
+    with contextlib.redirect_stdout(io.StringIO()):
+        return file, verify_file_errors(file, seed, mode, dist3_samples, min_budget)
+
+
+def verify_file_errors(file: str, seed: int, mode: str, dist3_samples: int, min_budget: bool = False) -> list:
+    """ Returns the error messages of the given instance, solution or .dist3 file, see verify_file """
+    try:
+        extension = os.path.splitext(file)[1]
+        if extension not in SOLUTION_EXTENSIONS + [".dist3"]:
+            instance = read_instance(file)
+            return [] if instance.budget is None else verify_budget(file, instance, seed, mode, min_budget)
+        instance_file = get_helper_instance_file(file)
+        if instance_file is None:
+            return ["no instance file found"]
+        instance = read_instance(instance_file)
+        if extension == ".dist3":
+            return verify_dist3(instance, file, dist3_samples, seed)
+        cost, utility, nodes = read_solution_file(file)
+        return verify_solution(instance, nodes, cost, utility, instance.budget if extension == ".sol" else None)
+    except Exception as e:
+        return [type(e).__name__ + ": " + str(e)]
+
+
+def run_verification(files: list, seed: int, mode: str, dist3_samples: int, workers: int,
+                     min_budget: bool = False) -> list:
+    """
+    Verifies all given files in a pool of worker processes.
+
+    :return: the file and the error messages for all files
+    """
+    results = []
+    with Pool(processes=max(1, workers)) as pool:
+        for file, errors in pool.imap_unordered(verify_file, [(file, seed, mode, dist3_samples, min_budget)
+                                                               for file in files]):
+            print(("OK      " if not errors else "FAILED  ") + file)
+            for error in errors[:MAX_REPORTED_ERRORS]:
+                print("        " + error)
+            if len(errors) > MAX_REPORTED_ERRORS:
+                print("        ... and " + str(len(errors) - MAX_REPORTED_ERRORS) + " more errors")
+            results.append((file, errors))
+    return results
+
+
+def main():
+    args = parse_args()
+    instance_paths = [path for path in args.paths if os.path.splitext(path)[1] not in SOLUTION_EXTENSIONS + [".dist3"]]
+    files = collect_instance_files(instance_paths) + collect_helper_files(args.paths)
+    results = run_verification(files, args.seed, args.mode, args.dist3_samples, args.workers, args.min_budget)
+    nb_failures = len([errors for file, errors in results if errors])
+    print("Verified " + str(len(results)) + " file(s), " + str(nb_failures) + " with errors")
+    if nb_failures > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()